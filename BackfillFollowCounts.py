@@ -0,0 +1,161 @@
+import json
+import boto3
+import logging
+import os
+import random
+import traceback
+from collections import Counter
+
+# Configuration du logging
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# Variables d'environnement
+FOLLOWS_TABLE = os.environ.get('FOLLOWS_TABLE', 'chordora-follows')
+USERS_TABLE = os.environ.get('USERS_TABLE', 'chordora-users')
+# Même valeur que FollowProfile ; une fois cette Lambda exécutée avec succès, FollowProfile
+# peut lire l'index shardé (FOLLOWERS_SHARDS_READY=true), pas avant
+FOLLOWERS_SHARDS = int(os.environ.get('FOLLOWERS_SHARDS', '0'))
+# Nombre de passes pour les profils modifiés par un abonnement pendant le recalcul
+BACKFILL_MAX_PASSES = int(os.environ.get('BACKFILL_MAX_PASSES', '3'))
+
+# Initialisation des clients AWS
+dynamodb = boto3.resource('dynamodb')
+follows_table = dynamodb.Table(FOLLOWS_TABLE)
+users_table = dynamodb.Table(USERS_TABLE)
+
+def scan_all_items(table, **scan_kwargs):
+    """
+    Parcourt toute une table (lecture fortement cohérente) en suivant LastEvaluatedKey
+    """
+    while True:
+        response = table.scan(ConsistentRead=True, **scan_kwargs)
+        yield from response.get('Items', [])
+        if 'LastEvaluatedKey' not in response:
+            return
+        scan_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+def snapshot_counters(user_ids=None):
+    """
+    Relève les compteurs actuels des profils (None si absent), avant le comptage des
+    abonnements : userId -> (followersCount, followingCount)
+    """
+    snapshot = {}
+    for item in scan_all_items(users_table, ProjectionExpression='userId, followersCount, followingCount'):
+        if user_ids is None or item['userId'] in user_ids:
+            snapshot[item['userId']] = (item.get('followersCount'), item.get('followingCount'))
+    return snapshot
+
+def count_follows(assign_shards):
+    """
+    Compte les followers et abonnements de chaque utilisateur à partir de la table des
+    abonnements ; attribue au passage un shard aux abonnements qui n'en ont pas encore.
+    Retourne (followers, abonnements, nombre d'abonnements shardés)
+    """
+    followers_counts = Counter()
+    following_counts = Counter()
+    sharded_count = 0
+    for item in scan_all_items(follows_table, ProjectionExpression='follow_id, follower_id, followed_id, followed_id_shard'):
+        followers_counts[item['followed_id']] += 1
+        following_counts[item['follower_id']] += 1
+
+        if assign_shards and 'followed_id_shard' not in item:
+            try:
+                follows_table.update_item(
+                    Key={'follow_id': item['follow_id']},
+                    UpdateExpression='SET followed_id_shard = :shard',
+                    ConditionExpression='attribute_exists(follow_id)',
+                    ExpressionAttributeValues={
+                        ':shard': f"{item['followed_id']}#{random.randrange(FOLLOWERS_SHARDS)}"
+                    }
+                )
+                sharded_count += 1
+            except dynamodb.meta.client.exceptions.ConditionalCheckFailedException:
+                # Abonnement supprimé pendant le parcours : ne pas recréer d'élément partiel
+                pass
+    return followers_counts, following_counts, sharded_count
+
+def write_counters(user_id, snapshot, followers_count, following_count):
+    """
+    Écrit les compteurs recalculés et marque le profil comme migré (followCountsReady), à
+    condition que les compteurs n'aient pas changé depuis le relevé : un abonnement traité
+    entre-temps par FollowProfile fait échouer l'écriture plutôt que d'être écrasé.
+    Retourne True si l'écriture a eu lieu
+    """
+    conditions = ['attribute_exists(userId)']
+    values = {
+        ':followers': followers_count,
+        ':following': following_count,
+        ':ready': True
+    }
+    for counter, previous in zip(['followersCount', 'followingCount'], snapshot):
+        if previous is None:
+            conditions.append(f'attribute_not_exists({counter})')
+        else:
+            conditions.append(f'{counter} = :previous_{counter}')
+            values[f':previous_{counter}'] = previous
+    try:
+        users_table.update_item(
+            Key={'userId': user_id},
+            UpdateExpression='SET followersCount = :followers, followingCount = :following, followCountsReady = :ready',
+            ConditionExpression=' AND '.join(conditions),
+            ExpressionAttributeValues=values
+        )
+        return True
+    except dynamodb.meta.client.exceptions.ConditionalCheckFailedException:
+        return False
+
+def lambda_handler(event, context):
+    """
+    Lambda de migration : recalcule les compteurs dénormalisés followersCount / followingCount
+    des profils à partir de la table des abonnements et marque chaque profil recalculé avec
+    followCountsReady ; FollowProfile ne lit les compteurs que sur les profils marqués.
+    Les compteurs sont relevés avant le parcours des abonnements et chaque écriture est
+    conditionnée à ce relevé : les profils modifiés pendant le recalcul sont repris à la passe
+    suivante. Idempotente, elle peut être relancée à tout moment (nouveaux profils, dérive).
+    Lorsque FOLLOWERS_SHARDS est défini, attribue aussi un shard aux abonnements existants
+    qui n'en ont pas encore, afin qu'ils apparaissent dans l'index followed_id_shard-index.
+    À exécuter après avoir défini FOLLOWERS_SHARDS sur FollowProfile et avant d'y activer
+    FOLLOWERS_SHARDS_READY.
+    """
+    try:
+        updated_count = 0
+        sharded_count = 0
+        pending_user_ids = None
+
+        for pass_number in range(BACKFILL_MAX_PASSES):
+            # Relever les compteurs avant de compter les abonnements
+            snapshot = snapshot_counters(pending_user_ids)
+            followers_counts, following_counts, sharded = count_follows(
+                assign_shards=FOLLOWERS_SHARDS > 0 and pass_number == 0
+            )
+            sharded_count += sharded
+
+            pending_user_ids = set()
+            for user_id, previous in snapshot.items():
+                if write_counters(user_id, previous, followers_counts[user_id], following_counts[user_id]):
+                    updated_count += 1
+                else:
+                    # Profil modifié (ou supprimé) depuis le relevé : reprendre à la passe suivante
+                    pending_user_ids.add(user_id)
+
+            if not pending_user_ids:
+                break
+
+        logger.info(f"Compteurs recalculés: {updated_count} profils mis à jour, {len(pending_user_ids)} à reprendre, {sharded_count} abonnements shardés")
+
+        return {
+            'statusCode': 200,
+            'body': json.dumps({
+                'usersUpdated': updated_count,
+                'usersPending': len(pending_user_ids),
+                'followsSharded': sharded_count
+            })
+        }
+    except Exception as e:
+        logger.error(f"Erreur lors du recalcul des compteurs d'abonnements: {str(e)}")
+        logger.error(traceback.format_exc())
+        return {
+            'statusCode': 500,
+            'body': json.dumps({'message': f'Error backfilling follow counts: {str(e)}'})
+        }
@@ -1,12 +1,25 @@
 import json
 import boto3
 import os
-import datetime
 import logging
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Optional
+from botocore.config import Config
 from boto3.dynamodb.conditions import Key, Attr
 import traceback
+from collections import OrderedDict
 from decimal import Decimal
 
+# orjson (extension C) est utilisé pour sérialiser les réponses lorsqu'il est empaqueté
+# avec la Lambda ; sinon on se rabat sur le module json standard
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 # Configuration du logging
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
@@ -14,9 +27,70 @@ logger.setLevel(logging.INFO)
 # Variables d'environnement
 FOLLOWS_TABLE = os.environ.get('FOLLOWS_TABLE', 'chordora-follows')
 USERS_TABLE = os.environ.get('USERS_TABLE', 'chordora-users')
+DAX_ENDPOINT = os.environ.get('DAX_ENDPOINT')
+# Nombre de shards de l'index des followers (0 = index followed_id-index non shardé).
+# Mise en service en trois temps : 1) définir FOLLOWERS_SHARDS (les nouveaux abonnements
+# reçoivent un shard, les lectures restent sur followed_id-index qui contient tous les
+# abonnements) ; 2) exécuter BackfillFollowCounts avec la même valeur pour attribuer un shard
+# aux abonnements existants ; 3) passer FOLLOWERS_SHARDS_READY à true pour lire l'index shardé
+FOLLOWERS_SHARDS = int(os.environ.get('FOLLOWERS_SHARDS', '0'))
+FOLLOWERS_SHARDS_READY = os.environ.get('FOLLOWERS_SHARDS_READY', 'false').lower() == 'true'
+
+# Attributs lus pour les profils résumés des listes followers/following
+PROFILE_SUMMARY_PROJECTION = 'userId, username, userType, profileImageUrl'
+
+# Constructeurs de conditions de clé réutilisés d'une requête à l'autre
+K_FOLLOWER = Key('follower_id')
+K_FOLLOWED = Key('followed_id')
+K_FOLLOWED_SHARD = Key('followed_id_shard')
+
+# Cache LRU des profils résumés, partagé entre les invocations d'un même conteneur
+PROFILE_CACHE_TTL = int(os.environ.get('PROFILE_CACHE_TTL', '60'))
+PROFILE_CACHE_SIZE = 4096
+profile_cache = OrderedDict()
+
+# Cache Redis (ElastiCache) des profils résumés partagé entre conteneurs, activé
+# uniquement lorsque REDIS_HOST est défini (le client redis n'est importé que dans ce cas)
+REDIS_HOST = os.environ.get('REDIS_HOST')
+REDIS_PROFILE_TTL = int(os.environ.get('REDIS_PROFILE_TTL', '300'))
+if REDIS_HOST:
+    import redis
+    redis_client = redis.Redis(
+        host=REDIS_HOST,
+        port=int(os.environ.get('REDIS_PORT', '6379')),
+        socket_timeout=0.05,
+        socket_connect_timeout=0.05
+    )
+else:
+    redis_client = None
+
+# Configuration botocore partagée : pool de connexions élargi et keep-alive TCP
+# pour réutiliser les connexions TLS entre invocations d'un même conteneur
+BOTO_CONFIG = Config(
+    max_pool_connections=50,
+    retries={'max_attempts': 5, 'mode': 'adaptive'},
+    tcp_keepalive=True
+)
+
+# Pool de threads réutilisé entre les invocations d'un même conteneur pour les lectures
+# parallèles (les tâches soumises ne doivent pas elles-mêmes soumettre de tâches)
+EXECUTOR = ThreadPoolExecutor(max_workers=8)
 
 # Initialisation des clients AWS
-dynamodb = boto3.resource('dynamodb')
+dynamodb = boto3.resource('dynamodb', config=BOTO_CONFIG)
+dynamodb_client = dynamodb.meta.client
+
+# Les lectures de profils passent par DAX lorsqu'un cluster est configuré (le client
+# amazondax n'est importé que dans ce cas). Les écritures des abonnements restent sur
+# DynamoDB : tout ce qui reflète l'état des abonnements (statut, isFollowing, compteurs,
+# listes) est donc lu directement sur DynamoDB pour ne pas servir le cache DAX périmé
+if DAX_ENDPOINT:
+    import amazondax
+    read_dynamodb = amazondax.AmazonDaxClient.resource(endpoint_url=DAX_ENDPOINT)
+    read_client = amazondax.AmazonDaxClient(endpoint_url=DAX_ENDPOINT)
+else:
+    read_dynamodb = dynamodb
+    read_client = dynamodb_client
 follows_table = dynamodb.Table(FOLLOWS_TABLE)
 users_table = dynamodb.Table(USERS_TABLE)
 
@@ -27,144 +101,442 @@ class DecimalEncoder(json.JSONEncoder):
             return float(obj)
         return super(DecimalEncoder, self).default(obj)
 
-def get_cors_headers():
-    """Retourne les en-têtes CORS standard"""
+def decimal_default(obj):
+    """Conversion des décimaux pour orjson"""
+    if isinstance(obj, Decimal):
+        return float(obj)
+    raise TypeError(f"Type {type(obj).__name__} non sérialisable en JSON")
+
+def to_json(payload):
+    """Sérialise le corps d'une réponse en JSON"""
+    if orjson is not None:
+        return orjson.dumps(payload, default=decimal_default).decode()
+    return json.dumps(payload, cls=DecimalEncoder)
+
+# En-têtes CORS standard (constants, construits une seule fois par conteneur)
+CORS_HEADERS = {
+    'Access-Control-Allow-Origin': 'http://localhost:3000',
+    'Access-Control-Allow-Headers': 'Content-Type,X-Amz-Date,Authorization,X-Api-Key,X-Amz-Security-Token',
+    'Access-Control-Allow-Methods': 'GET,POST,PUT,DELETE,OPTIONS',
+    'Access-Control-Allow-Credentials': 'true'
+}
+
+def query_all_items(table, **query_kwargs):
+    """
+    Exécute une requête Query en suivant LastEvaluatedKey pour récupérer toutes les pages
+    """
+    items = []
+    while True:
+        response = table.query(**query_kwargs)
+        items.extend(response.get('Items', []))
+        if 'LastEvaluatedKey' not in response:
+            return items
+        query_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+def count_all_items(table, **query_kwargs):
+    """
+    Compte les éléments d'une requête Query (Select='COUNT') sur toutes les pages
+    """
+    count = 0
+    while True:
+        response = table.query(Select='COUNT', **query_kwargs)
+        count += response.get('Count', 0)
+        if 'LastEvaluatedKey' not in response:
+            return count
+        query_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+def followers_key_conditions(user_id):
+    """
+    Retourne les couples (index, condition de clé) à interroger pour lire les followers
+    d'un utilisateur : un par shard lorsque l'index des followers est shardé et que tous
+    les abonnements existants ont reçu un shard (FOLLOWERS_SHARDS_READY)
+    """
+    if FOLLOWERS_SHARDS > 0 and FOLLOWERS_SHARDS_READY:
+        return [
+            ('followed_id_shard-index', K_FOLLOWED_SHARD.eq(f"{user_id}#{shard}"))
+            for shard in range(FOLLOWERS_SHARDS)
+        ]
+    return [('followed_id-index', K_FOLLOWED.eq(user_id))]
+
+def batch_get_all(request_items, source, max_attempts=5):
+    """
+    Exécute un BatchGetItem sur source (DAX ou DynamoDB) en resoumettant les UnprocessedKeys
+    (throttling, réponse partielle) avec un backoff exponentiel aléatoire.
+    Retourne un dictionnaire table -> éléments lus
+    """
+    items = {}
+    remaining = request_items
+    for attempt in range(max_attempts):
+        response = source.batch_get_item(RequestItems=remaining)
+        for table_name, table_items in response.get('Responses', {}).items():
+            items.setdefault(table_name, []).extend(table_items)
+        
+        remaining = response.get('UnprocessedKeys')
+        if not remaining:
+            return items
+        time.sleep(random.uniform(0, 0.05 * 2 ** attempt))
+    
+    logger.warning(f"Clés non traitées après {max_attempts} tentatives: {sum(len(r['Keys']) for r in remaining.values())}")
+    return items
+
+def get_cached_profiles(user_ids):
+    """
+    Sépare les profils présents et encore valides dans le cache du conteneur des identifiants
+    à relire. Retourne (profils trouvés, identifiants manquants)
+    """
+    now = time.monotonic()
+    profiles = {}
+    misses = []
+    for user_id in user_ids:
+        entry = profile_cache.get(user_id)
+        if entry and entry[0] > now:
+            profiles[user_id] = entry[1]
+            profile_cache.move_to_end(user_id)
+        else:
+            misses.append(user_id)
+    return profiles, misses
+
+def cache_profiles(profiles):
+    """Ajoute des profils au cache en évinçant les moins récemment utilisés"""
+    expires_at = time.monotonic() + PROFILE_CACHE_TTL
+    for user_id, profile in profiles.items():
+        profile_cache[user_id] = (expires_at, profile)
+        profile_cache.move_to_end(user_id)
+    while len(profile_cache) > PROFILE_CACHE_SIZE:
+        profile_cache.popitem(last=False)
+
+def get_redis_profiles(user_ids):
+    """
+    Lit les profils résumés depuis Redis en un seul pipeline.
+    Retourne (profils trouvés, identifiants manquants) ; en cas d'indisponibilité de Redis,
+    tous les identifiants sont considérés manquants
+    """
+    if redis_client is None:
+        return {}, user_ids
+    try:
+        pipe = redis_client.pipeline(transaction=False)
+        for user_id in user_ids:
+            pipe.get(f"u:{user_id}")
+        values = pipe.execute()
+    except redis.RedisError as e:
+        logger.warning(f"Cache Redis indisponible, lecture DynamoDB: {str(e)}")
+        return {}, user_ids
+    
+    profiles = {}
+    misses = []
+    for user_id, value in zip(user_ids, values):
+        if value is None:
+            misses.append(user_id)
+        else:
+            profiles[user_id] = json.loads(value)
+    return profiles, misses
+
+def set_redis_profiles(profiles):
+    """Enregistre des profils résumés dans Redis avec une durée de vie REDIS_PROFILE_TTL"""
+    if redis_client is None or not profiles:
+        return
+    try:
+        pipe = redis_client.pipeline(transaction=False)
+        for user_id, profile in profiles.items():
+            pipe.setex(f"u:{user_id}", REDIS_PROFILE_TTL, to_json(profile))
+        pipe.execute()
+    except redis.RedisError as e:
+        logger.warning(f"Impossible d'alimenter le cache Redis: {str(e)}")
+
+def batch_get_keys(table_name, keys, projection, source):
+    """
+    Lit une liste de clés par BatchGetItem (100 clés max par appel) sur source, les lots
+    étant envoyés en parallèle. Retourne la liste des éléments trouvés
+    """
+    chunks = [keys[i:i + 100] for i in range(0, len(keys), 100)]
+    if not chunks:
+        return []
+    
+    def fetch_chunk(chunk):
+        request_items = {
+            table_name: {
+                'Keys': chunk,
+                'ProjectionExpression': projection
+            }
+        }
+        return batch_get_all(request_items, source).get(table_name, [])
+    
+    return [item for items in EXECUTOR.map(fetch_chunk, chunks) for item in items]
+
+def batch_get_profiles(user_ids):
+    """
+    Récupère les profils résumés d'une liste d'utilisateurs, d'abord depuis le cache du
+    conteneur, puis depuis Redis s'il est configuré, et enfin par BatchGetItem pour les
+    profils manquants.
+    Retourne un dictionnaire userId -> profil ; les comptes inexistants sont absents
+    """
+    profiles, misses = get_cached_profiles(user_ids)
+    if not misses:
+        return profiles
+    
+    redis_profiles, misses = get_redis_profiles(misses)
+    cache_profiles(redis_profiles)
+    profiles.update(redis_profiles)
+    if not misses:
+        return profiles
+    
+    fetched = {
+        item['userId']: item
+        for item in batch_get_keys(USERS_TABLE, [{'userId': user_id} for user_id in misses], PROFILE_SUMMARY_PROJECTION, read_dynamodb)
+    }
+    cache_profiles(fetched)
+    set_redis_profiles(fetched)
+    profiles.update(fetched)
+    return profiles
+
+def get_followed_among(current_user_id, user_ids):
+    """
+    Retourne l'ensemble des utilisateurs de user_ids suivis par current_user_id,
+    en une lecture BatchGetItem par lot de 100 au lieu d'un get_item par utilisateur
+    """
+    keys = [{'follow_id': f"{current_user_id}#{user_id}"} for user_id in user_ids if user_id != current_user_id]
+    prefix_length = len(current_user_id) + 1
+    return {item['follow_id'][prefix_length:] for item in batch_get_keys(FOLLOWS_TABLE, keys, 'follow_id', dynamodb)}
+
+def user_exists(user_id):
+    """
+    Vérifie l'existence d'un profil par le client bas niveau : seule la clé est lue
+    et aucun attribut n'est désérialisé
+    """
+    response = read_client.get_item(
+        TableName=USERS_TABLE,
+        Key={'userId': {'S': user_id}},
+        ProjectionExpression='userId'
+    )
+    return 'Item' in response
+
+def follow_counter_update(user_id, counters, delta):
+    """
+    Construit la mise à jour atomique des compteurs dénormalisés (followersCount / followingCount)
+    d'un profil, au format d'une opération TransactWriteItems
+    """
+    return {
+        'Update': {
+            'TableName': USERS_TABLE,
+            'Key': {'userId': {'S': user_id}},
+            'UpdateExpression': 'ADD ' + ', '.join(f'{counter} :delta' for counter in counters),
+            'ConditionExpression': 'attribute_exists(userId)',
+            'ExpressionAttributeValues': {':delta': {'N': str(delta)}}
+        }
+    }
+
+def write_follow_with_counters(follow_write, counter_updates, required_user_id=None):
+    """
+    Écrit ou supprime l'abonnement et met à jour les compteurs des deux profils dans une
+    même transaction. Les profils absents (compte supprimé) sont ignorés plutôt que recréés,
+    sauf required_user_id dont l'absence annule l'écriture.
+    Retourne 'written', 'unchanged' si la condition portant sur l'abonnement lui-même a échoué,
+    ou 'user_not_found' si le profil requis n'existe pas.
+    """
+    transact_items = [follow_write] + counter_updates
+    while True:
+        try:
+            dynamodb_client.transact_write_items(TransactItems=transact_items)
+            return 'written'
+        except dynamodb_client.exceptions.TransactionCanceledException as e:
+            reasons = [reason.get('Code') for reason in e.response.get('CancellationReasons', [])]
+            if not reasons:
+                raise
+            if reasons[0] == 'ConditionalCheckFailed':
+                return 'unchanged'
+            
+            # Retirer les mises à jour de compteurs dont le profil n'existe plus
+            remaining_updates = []
+            for update, code in zip(transact_items[1:], reasons[1:]):
+                if code != 'ConditionalCheckFailed':
+                    remaining_updates.append(update)
+                elif update['Update']['Key']['userId']['S'] == required_user_id:
+                    return 'user_not_found'
+            if len(remaining_updates) == len(transact_items) - 1:
+                raise
+            transact_items = [follow_write] + remaining_updates
+
+def parse_follow_path(path):
+    """
+    Décompose le chemin d'une requête GET en (action, identifiant) :
+    action vaut 'status', 'followers', 'following' ou '' pour les compteurs
+    """
+    segments = path.split('/')
+    for index, segment in enumerate(segments):
+        if segment in FOLLOW_ACTIONS:
+            return segment, '/'.join(segments[index + 1:]) or None
+    
+    last_segment = segments[-1]
+    if last_segment and last_segment not in ['follow', 'follows']:
+        return '', last_segment
+    return '', None
+
+def validate_follow_body(body, follower_id, reject_self):
+    """
+    Validation purement locale du corps d'une requête POST/DELETE, sans aucun accès réseau.
+    Retourne (followed_id, None) ou (None, message d'erreur)
+    """
+    try:
+        payload = json.loads(body) if body else {}
+    except json.JSONDecodeError as e:
+        return None, f'Invalid request body: {str(e)}'
+    
+    followed_id = payload.get('followedId') if isinstance(payload, dict) else None
+    if not followed_id or not isinstance(followed_id, str):
+        return None, 'followedId is required'
+    if reject_self and followed_id == follower_id:
+        return None, 'Cannot follow yourself'
+    return followed_id, None
+
+def validation_error(message, cors_headers):
+    """Réponse 400 pour une requête rejetée par la validation locale"""
+    logger.warning(f"Requête invalide: {message}")
     return {
-        'Access-Control-Allow-Origin': 'http://localhost:3000',
-        'Access-Control-Allow-Headers': 'Content-Type,X-Amz-Date,Authorization,X-Api-Key,X-Amz-Security-Token',
-        'Access-Control-Allow-Methods': 'GET,POST,PUT,DELETE,OPTIONS',
-        'Access-Control-Allow-Credentials': 'true'
+        'statusCode': 400,
+        'headers': cors_headers,
+        'body': to_json({'message': message})
     }
 
+def route_follow(ctx, cors_headers):
+    """POST : suivre un utilisateur"""
+    followed_id, error = validate_follow_body(ctx.body, ctx.auth_user_id, reject_self=True)
+    if error:
+        return validation_error(error, cors_headers)
+    return follow_user(ctx.auth_user_id, followed_id, cors_headers, ctx.now)
+
+def route_unfollow(ctx, cors_headers):
+    """DELETE : ne plus suivre un utilisateur"""
+    followed_id, error = validate_follow_body(ctx.body, ctx.auth_user_id, reject_self=False)
+    if error:
+        return validation_error(error, cors_headers)
+    return unfollow_user(ctx.auth_user_id, followed_id, cors_headers)
+
+def route_follow_status(ctx, cors_headers):
+    """GET /follows/status/{targetId} : statut de suivi entre deux utilisateurs"""
+    target_id = ctx.resource_id or ctx.path_parameters.get('targetId')
+    if not target_id:
+        return {
+            'statusCode': 400,
+            'headers': cors_headers,
+            'body': to_json({'message': 'Target ID is required'})
+        }
+    return get_follow_status(ctx.auth_user_id, target_id, cors_headers)
+
+def route_followers(ctx, cors_headers):
+    """GET /follows/followers/{userId} : liste des followers"""
+    user_id = ctx.resource_id or ctx.path_parameters.get('userId') or ctx.auth_user_id
+    return get_followers(user_id, ctx.auth_user_id, cors_headers)
+
+def route_following(ctx, cors_headers):
+    """GET /follows/following/{userId} : liste des abonnements"""
+    user_id = ctx.resource_id or ctx.path_parameters.get('userId') or ctx.auth_user_id
+    return get_following(user_id, ctx.auth_user_id, cors_headers)
+
+def route_follow_counts(ctx, cors_headers):
+    """GET /follows/{userId} : compteurs de followers et d'abonnements"""
+    user_id = ctx.resource_id or ctx.path_parameters.get('userId') or ctx.auth_user_id
+    return get_follow_counts(user_id, cors_headers)
+
+# Table de routage (méthode HTTP, action) -> gestionnaire
+FOLLOW_ACTIONS = {'status', 'followers', 'following'}
+ROUTES = {
+    ('POST', ''): route_follow,
+    ('DELETE', ''): route_unfollow,
+    ('GET', 'status'): route_follow_status,
+    ('GET', 'followers'): route_followers,
+    ('GET', 'following'): route_following,
+    ('GET', ''): route_follow_counts
+}
+
+@dataclass(slots=True)
+class RequestContext:
+    """Informations extraites une seule fois de l'événement API Gateway"""
+    method: str
+    path: str
+    action: str
+    resource_id: Optional[str]
+    path_parameters: dict
+    body: Optional[str]
+    auth_user_id: Optional[str]
+    now: int
+
+def build_request_context(event):
+    """Construit le contexte de la requête en un seul passage sur l'événement"""
+    method = event.get('httpMethod', '')
+    path = event.get('path', '') or ''
+    if method == 'GET':
+        action, resource_id = parse_follow_path(path.rstrip('/'))
+    else:
+        action, resource_id = '', None
+    
+    claims = ((event.get('requestContext') or {}).get('authorizer') or {}).get('claims') or {}
+    return RequestContext(
+        method=method,
+        path=path,
+        action=action,
+        resource_id=resource_id,
+        path_parameters=event.get('pathParameters') or {},
+        body=event.get('body'),
+        auth_user_id=claims.get('sub'),
+        now=int(time.time())
+    )
+
 def lambda_handler(event, context):
     """
-    Gestionnaire principal de la Lambda - traite toutes les opérations liées aux abonnements
+    Gestionnaire principal de la Lambda - traite toutes les opérations liées aux abonnements.
+    Émet un unique enregistrement de log structuré par requête.
+    """
+    start_time = time.perf_counter()
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Événement reçu: %s", json.dumps(event))
+    
+    ctx = build_request_context(event)
+    response = None
+    try:
+        response = dispatch_request(ctx)
+        return response
+    finally:
+        logger.info(to_json({
+            'method': ctx.method,
+            'path': ctx.path,
+            'status': response['statusCode'] if response else 500,
+            'latencyMs': round((time.perf_counter() - start_time) * 1000, 2),
+            'userId': ctx.auth_user_id
+        }))
+
+def dispatch_request(ctx):
+    """
+    Vérifie l'authentification et route la requête vers le gestionnaire approprié
     """
-    logger.info(f"Événement reçu: {json.dumps(event)}")
-    cors_headers = get_cors_headers()
+    cors_headers = CORS_HEADERS
     
     # Gestion CORS pre-flight
-    if event.get('httpMethod') == 'OPTIONS':
+    if ctx.method == 'OPTIONS':
         return {
             'statusCode': 200,
             'headers': cors_headers,
-            'body': json.dumps('Preflight request successful')
+            'body': to_json('Preflight request successful')
         }
     
     # Vérification d'authentification
-    try:
-        auth_context = event['requestContext']['authorizer']['claims']
-        follower_id = auth_context['sub']
-        logger.info(f"Utilisateur authentifié: {follower_id}")
-    except (KeyError, TypeError) as e:
-        logger.error(f"Erreur d'authentification: {str(e)}")
+    if not ctx.auth_user_id:
+        logger.error("Erreur d'authentification: claims absents de la requête")
         return {
             'statusCode': 401,
             'headers': cors_headers,
-            'body': json.dumps({'message': 'Unauthorized: Authentication required'})
+            'body': to_json({'message': 'Unauthorized: Authentication required'})
         }
     
     # Router vers les fonctions appropriées en fonction de la méthode et du chemin
-    http_method = event['httpMethod']
-    path = event.get('path', '').rstrip('/')
-    path_parameters = event.get('pathParameters', {}) or {}
-    
     try:
-        if http_method == 'POST':
-            # Suivre un utilisateur
-            try:
-                body = json.loads(event['body']) if event.get('body') else {}
-                followed_id = body.get('followedId')
-                
-                if not followed_id:
-                    return {
-                        'statusCode': 400,
-                        'headers': cors_headers,
-                        'body': json.dumps({'message': 'followedId is required'})
-                    }
-                
-                return follow_user(follower_id, followed_id, cors_headers)
-            except (json.JSONDecodeError, KeyError) as e:
-                logger.error(f"Erreur de traitement du body: {str(e)}")
-                return {
-                    'statusCode': 400,
-                    'headers': cors_headers,
-                    'body': json.dumps({'message': f'Invalid request body: {str(e)}'})
-                }
-                
-        elif http_method == 'DELETE':
-            # Ne plus suivre un utilisateur
-            try:
-                body = json.loads(event['body']) if event.get('body') else {}
-                followed_id = body.get('followedId')
-                
-                if not followed_id:
-                    return {
-                        'statusCode': 400,
-                        'headers': cors_headers,
-                        'body': json.dumps({'message': 'followedId is required'})
-                    }
-                
-                return unfollow_user(follower_id, followed_id, cors_headers)
-            except (json.JSONDecodeError, KeyError) as e:
-                logger.error(f"Erreur de traitement du body: {str(e)}")
-                return {
-                    'statusCode': 400,
-                    'headers': cors_headers,
-                    'body': json.dumps({'message': f'Invalid request body: {str(e)}'})
-                }
+        route = ROUTES.get((ctx.method, ctx.action))
+        if route:
+            return route(ctx, cors_headers)
         
-        elif http_method == 'GET':
-            # Vérifier le statut de suivi ou obtenir les liste des followers/following
-            if path.endswith('/status') or '/status/' in path:
-                if '/status/' in path:
-                    target_id = path.split('/status/')[1]
-                elif 'targetId' in path_parameters:
-                    target_id = path_parameters['targetId']
-                else:
-                    return {
-                        'statusCode': 400,
-                        'headers': cors_headers,
-                        'body': json.dumps({'message': 'Target ID is required'})
-                    }
-                    
-                return get_follow_status(follower_id, target_id, cors_headers)
-                
-            elif path.endswith('/followers') or '/followers/' in path:
-                if '/followers/' in path:
-                    user_id = path.split('/followers/')[1]
-                elif 'userId' in path_parameters:
-                    user_id = path_parameters['userId']
-                else:
-                    user_id = follower_id
-                    
-                return get_followers(user_id, follower_id, cors_headers)
-                
-            elif path.endswith('/following') or '/following/' in path:
-                if '/following/' in path:
-                    user_id = path.split('/following/')[1]
-                elif 'userId' in path_parameters:
-                    user_id = path_parameters['userId']
-                else:
-                    user_id = follower_id
-                    
-                return get_following(user_id, follower_id, cors_headers)
-                
-            else:
-                # Compteurs pour l'utilisateur spécifié ou l'utilisateur authentifié
-                if '/' in path and path.split('/')[-1] not in ['follow', 'follows']:
-                    user_id = path.split('/')[-1]
-                elif 'userId' in path_parameters:
-                    user_id = path_parameters['userId']
-                else:
-                    user_id = follower_id
-                    
-                return get_follow_counts(user_id, cors_headers)
-                
         return {
             'statusCode': 400,
             'headers': cors_headers,
-            'body': json.dumps({'message': 'Invalid request method or path'})
+            'body': to_json({'message': 'Invalid request method or path'})
         }
         
     except Exception as e:
@@ -173,51 +545,58 @@ def lambda_handler(event, context):
         return {
             'statusCode': 500,
             'headers': cors_headers,
-            'body': json.dumps({'message': f'Internal server error: {str(e)}'})
+            'body': to_json({'message': f'Internal server error: {str(e)}'})
         }
 
-def follow_user(follower_id, followed_id, cors_headers):
+def follow_user(follower_id, followed_id, cors_headers, timestamp):
     """
-    Permet à un utilisateur d'en suivre un autre
+    Permet à un utilisateur d'en suivre un autre.
+    Les paramètres (dont l'auto-abonnement) sont validés en amont par validate_follow_body
     """
-    # Vérifier que l'utilisateur ne se suit pas lui-même
-    if follower_id == followed_id:
-        return {
-            'statusCode': 400,
-            'headers': cors_headers,
-            'body': json.dumps({'message': 'Cannot follow yourself'})
-        }
+    follow_id = f"{follower_id}#{followed_id}"
     
-    # Vérifier que l'utilisateur à suivre existe
     try:
-        user_response = users_table.get_item(Key={'userId': followed_id})
-        if 'Item' not in user_response:
+        # Créer l'abonnement et incrémenter les compteurs des deux profils ;
+        # la condition sur follow_id remplace la lecture préalable et celle portant sur
+        # le profil suivi garantit que l'utilisateur à suivre existe
+        follow_item = {
+            'follow_id': {'S': follow_id},
+            'follower_id': {'S': follower_id},
+            'followed_id': {'S': followed_id},
+            'created_at': {'N': str(timestamp)}
+        }
+        if FOLLOWERS_SHARDS > 0:
+            # Répartir les followers d'un même compte sur plusieurs partitions de l'index
+            follow_item['followed_id_shard'] = {'S': f"{followed_id}#{random.randrange(FOLLOWERS_SHARDS)}"}
+        
+        result = write_follow_with_counters(
+            {
+                'Put': {
+                    'TableName': FOLLOWS_TABLE,
+                    'Item': follow_item,
+                    'ConditionExpression': 'attribute_not_exists(follow_id)'
+                }
+            },
+            [
+                follow_counter_update(followed_id, ['followersCount'], 1),
+                follow_counter_update(follower_id, ['followingCount'], 1)
+            ],
+            required_user_id=followed_id
+        )
+        
+        if result == 'user_not_found':
             return {
                 'statusCode': 404,
                 'headers': cors_headers,
-                'body': json.dumps({'message': 'User to follow not found'})
+                'body': to_json({'message': 'User to follow not found'})
             }
-    except Exception as e:
-        logger.error(f"Erreur lors de la vérification de l'utilisateur à suivre: {str(e)}")
-        return {
-            'statusCode': 500,
-            'headers': cors_headers,
-            'body': json.dumps({'message': f'Error verifying user to follow: {str(e)}'})
-        }
-    
-    # Vérifier si l'abonnement existe déjà
-    follow_id = f"{follower_id}#{followed_id}"
-    
-    try:
-        response = follows_table.get_item(Key={'follow_id': follow_id})
         
-        if 'Item' in response:
+        if result == 'unchanged':
             # L'abonnement existe déjà
-            logger.info(f"L'utilisateur {follower_id} suit déjà {followed_id}")
             return {
                 'statusCode': 200,
                 'headers': cors_headers,
-                'body': json.dumps({
+                'body': to_json({
                     'message': 'Already following this user',
                     'isFollowing': True,
                     'followedId': followed_id,
@@ -225,24 +604,10 @@ def follow_user(follower_id, followed_id, cors_headers):
                 })
             }
         
-        # Créer l'abonnement
-        timestamp = int(datetime.datetime.now().timestamp())
-        
-        follows_table.put_item(
-            Item={
-                'follow_id': follow_id,
-                'follower_id': follower_id,
-                'followed_id': followed_id,
-                'created_at': timestamp
-            }
-        )
-        
-        logger.info(f"L'utilisateur {follower_id} suit maintenant {followed_id}")
-        
         return {
             'statusCode': 200,
             'headers': cors_headers,
-            'body': json.dumps({
+            'body': to_json({
                 'message': 'Successfully followed user',
                 'isFollowing': True,
                 'followedId': followed_id,
@@ -255,7 +620,7 @@ def follow_user(follower_id, followed_id, cors_headers):
         return {
             'statusCode': 500,
             'headers': cors_headers,
-            'body': json.dumps({'message': f'Error adding follow: {str(e)}'})
+            'body': to_json({'message': f'Error adding follow: {str(e)}'})
         }
 
 def unfollow_user(follower_id, followed_id, cors_headers):
@@ -265,16 +630,35 @@ def unfollow_user(follower_id, followed_id, cors_headers):
     follow_id = f"{follower_id}#{followed_id}"
     
     try:
-        # Vérifier si l'abonnement existe
-        response = follows_table.get_item(Key={'follow_id': follow_id})
+        # Une transaction ne peut pas modifier deux fois le même élément : pour un ancien
+        # auto-abonnement, les deux compteurs sont décrémentés par une seule mise à jour
+        if follower_id == followed_id:
+            counter_updates = [follow_counter_update(follower_id, ['followersCount', 'followingCount'], -1)]
+        else:
+            counter_updates = [
+                follow_counter_update(followed_id, ['followersCount'], -1),
+                follow_counter_update(follower_id, ['followingCount'], -1)
+            ]
         
-        if 'Item' not in response:
+        # Supprimer l'abonnement et décrémenter les compteurs des deux profils ;
+        # la condition sur follow_id remplace la lecture préalable
+        result = write_follow_with_counters(
+            {
+                'Delete': {
+                    'TableName': FOLLOWS_TABLE,
+                    'Key': {'follow_id': {'S': follow_id}},
+                    'ConditionExpression': 'attribute_exists(follow_id)'
+                }
+            },
+            counter_updates
+        )
+        
+        if result == 'unchanged':
             # L'abonnement n'existe pas
-            logger.info(f"L'utilisateur {follower_id} ne suit pas {followed_id}")
             return {
                 'statusCode': 200,
                 'headers': cors_headers,
-                'body': json.dumps({
+                'body': to_json({
                     'message': 'Not following this user',
                     'isFollowing': False,
                     'followedId': followed_id,
@@ -282,15 +666,10 @@ def unfollow_user(follower_id, followed_id, cors_headers):
                 })
             }
         
-        # Supprimer l'abonnement
-        follows_table.delete_item(Key={'follow_id': follow_id})
-        
-        logger.info(f"L'utilisateur {follower_id} ne suit plus {followed_id}")
-        
         return {
             'statusCode': 200,
             'headers': cors_headers,
-            'body': json.dumps({
+            'body': to_json({
                 'message': 'Successfully unfollowed user',
                 'isFollowing': False,
                 'followedId': followed_id,
@@ -303,7 +682,7 @@ def unfollow_user(follower_id, followed_id, cors_headers):
         return {
             'statusCode': 500,
             'headers': cors_headers,
-            'body': json.dumps({'message': f'Error removing follow: {str(e)}'})
+            'body': to_json({'message': f'Error removing follow: {str(e)}'})
         }
 
 def get_follow_status(follower_id, target_id, cors_headers):
@@ -311,22 +690,33 @@ def get_follow_status(follower_id, target_id, cors_headers):
     Vérifie si un utilisateur en suit un autre et vice versa
     """
     try:
-        # Vérifier si follower_id suit target_id
+        # Récupérer les deux sens de la relation en un seul aller-retour
         follow_id = f"{follower_id}#{target_id}"
-        response1 = follows_table.get_item(Key={'follow_id': follow_id})
-        is_following = 'Item' in response1
-        
-        # Vérifier si target_id suit follower_id
         follow_id_reverse = f"{target_id}#{follower_id}"
-        response2 = follows_table.get_item(Key={'follow_id': follow_id_reverse})
-        is_followed_by = 'Item' in response2
-        
-        logger.info(f"Statut de suivi: {follower_id} -> {target_id}: {is_following}, {target_id} -> {follower_id}: {is_followed_by}")
+
+        # Client bas niveau : clés et réponses au format AttributeValue brut, sans passer
+        # par le (dé)sérialiseur de l'API resource
+        keys = [{'follow_id': {'S': follow_id}}]
+        if follow_id_reverse != follow_id:
+            keys.append({'follow_id': {'S': follow_id_reverse}})
+
+        response = dynamodb_client.batch_get_item(
+            RequestItems={
+                FOLLOWS_TABLE: {
+                    'Keys': keys,
+                    'ProjectionExpression': 'follow_id'
+                }
+            }
+        )
+        found_ids = {item['follow_id']['S'] for item in response.get('Responses', {}).get(FOLLOWS_TABLE, [])}
+
+        is_following = follow_id in found_ids
+        is_followed_by = follow_id_reverse in found_ids
         
         return {
             'statusCode': 200,
             'headers': cors_headers,
-            'body': json.dumps({
+            'body': to_json({
                 'isFollowing': is_following,
                 'isFollowedBy': is_followed_by,
                 'follower_id': follower_id,
@@ -339,7 +729,7 @@ def get_follow_status(follower_id, target_id, cors_headers):
         return {
             'statusCode': 500,
             'headers': cors_headers,
-            'body': json.dumps({'message': f'Error checking follow status: {str(e)}'})
+            'body': to_json({'message': f'Error checking follow status: {str(e)}'})
         }
 
 def get_follow_counts(user_id, cors_headers):
@@ -347,39 +737,53 @@ def get_follow_counts(user_id, cors_headers):
     Obtient le nombre de followers et d'abonnements d'un utilisateur
     """
     try:
-        # Vérifier que l'utilisateur existe
-        user_response = users_table.get_item(Key={'userId': user_id})
+        # Lire les compteurs dénormalisés sur le profil (vérifie aussi que l'utilisateur existe)
+        user_response = users_table.get_item(
+            Key={'userId': user_id},
+            ProjectionExpression='userId, followersCount, followingCount, followCountsReady'
+        )
         if 'Item' not in user_response:
             return {
                 'statusCode': 404,
                 'headers': cors_headers,
-                'body': json.dumps({'message': 'User not found'})
+                'body': to_json({'message': 'User not found'})
             }
-            
-        # Compter les followers (ceux qui suivent l'utilisateur)
-        followers_response = follows_table.query(
-            IndexName='followed_id-index',
-            KeyConditionExpression=Key('followed_id').eq(user_id)
-        )
-        followers_count = followers_response.get('Count', 0)
-        
-        # Compter les following (ceux que l'utilisateur suit)
-        following_response = follows_table.query(
-            IndexName='follower_id-index',
-            KeyConditionExpression=Key('follower_id').eq(user_id)
-        )
-        following_count = following_response.get('Count', 0)
         
-        logger.info(f"Compteurs pour {user_id}: {followers_count} abonnés, {following_count} abonnements")
+        user = user_response['Item']
+        if user.get('followCountsReady'):
+            # Décimaux DynamoDB convertis en entiers, comme les comptages du repli
+            followers_count = int(user['followersCount'])
+            following_count = int(user['followingCount'])
+        else:
+            # Profil pas encore migré (voir BackfillFollowCounts) : les compteurs éventuellement
+            # présents sont partis de 0 et ne sont pas fiables, compter via les index
+            followers_conditions = followers_key_conditions(user_id)
+            followers_futures = [
+                EXECUTOR.submit(
+                    count_all_items,
+                    follows_table,
+                    IndexName=index_name,
+                    KeyConditionExpression=key_condition
+                )
+                for index_name, key_condition in followers_conditions
+            ]
+            following_future = EXECUTOR.submit(
+                count_all_items,
+                follows_table,
+                IndexName='follower_id-index',
+                KeyConditionExpression=K_FOLLOWER.eq(user_id)
+            )
+            followers_count = sum(future.result() for future in followers_futures)
+            following_count = following_future.result()
         
         return {
             'statusCode': 200,
             'headers': cors_headers,
-            'body': json.dumps({
+            'body': to_json({
                 'userId': user_id,
                 'followersCount': followers_count,
                 'followingCount': following_count
-            }, cls=DecimalEncoder)
+            })
         }
     except Exception as e:
         logger.error(f"Erreur lors du comptage des relations de suivi: {str(e)}")
@@ -387,7 +791,7 @@ def get_follow_counts(user_id, cors_headers):
         return {
             'statusCode': 500,
             'headers': cors_headers,
-            'body': json.dumps({'message': f'Error counting follows: {str(e)}'})
+            'body': to_json({'message': f'Error counting follows: {str(e)}'})
         }
 
 def get_followers(user_id, current_user_id, cors_headers):
@@ -396,30 +800,37 @@ def get_followers(user_id, current_user_id, cors_headers):
     """
     try:
         # Vérifier que l'utilisateur existe
-        user_response = users_table.get_item(Key={'userId': user_id})
-        if 'Item' not in user_response:
+        if not user_exists(user_id):
             return {
                 'statusCode': 404,
                 'headers': cors_headers,
-                'body': json.dumps({'message': 'User not found'})
+                'body': to_json({'message': 'User not found'})
             }
             
-        # Récupérer les followers
-        followers_response = follows_table.query(
-            IndexName='followed_id-index',
-            KeyConditionExpression=Key('followed_id').eq(user_id)
+        # Récupérer les followers (en parallèle sur chaque shard de l'index)
+        followers_conditions = followers_key_conditions(user_id)
+        followers_pages = EXECUTOR.map(
+            lambda condition: query_all_items(
+                follows_table,
+                IndexName=condition[0],
+                KeyConditionExpression=condition[1],
+                ProjectionExpression='follower_id, created_at'
+            ),
+            followers_conditions
         )
-        
-        followers_items = followers_response.get('Items', [])
+        followers_items = [item for page in followers_pages for item in page]
         follower_ids = [item['follower_id'] for item in followers_items]
+        follow_dates = {item['follower_id']: item.get('created_at') for item in followers_items}
         
-        # Récupérer les informations de profil des followers
+        # Récupérer les informations de profil des followers et les abonnements de
+        # l'utilisateur courant parmi eux
+        profiles_by_id = batch_get_profiles(follower_ids)
+        followed_by_current = get_followed_among(current_user_id, follower_ids)
         followers_profiles = []
         
         for follower_id in follower_ids:
-            follower_response = users_table.get_item(Key={'userId': follower_id})
-            if 'Item' in follower_response:
-                follower = follower_response['Item']
+            follower = profiles_by_id.get(follower_id)
+            if follower:
                 
                 # Créer un objet profil simplifié
                 profile = {
@@ -430,15 +841,11 @@ def get_followers(user_id, current_user_id, cors_headers):
                 }
                 
                 # Ajouter la date de suivi
-                for item in followers_items:
-                    if item['follower_id'] == follower_id:
-                        profile['followDate'] = item.get('created_at')
+                profile['followDate'] = follow_dates[follower_id]
                 
                 # Vérifier si l'utilisateur courant suit ce follower
                 if current_user_id != follower_id:
-                    follow_id = f"{current_user_id}#{follower_id}"
-                    is_following_response = follows_table.get_item(Key={'follow_id': follow_id})
-                    profile['isFollowing'] = 'Item' in is_following_response
+                    profile['isFollowing'] = follower_id in followed_by_current
                 
                 followers_profiles.append(profile)
         
@@ -449,16 +856,14 @@ def get_followers(user_id, current_user_id, cors_headers):
             reverse=True
         )
         
-        logger.info(f"Récupéré {len(followers_profiles)} followers pour {user_id}")
-        
         return {
             'statusCode': 200,
             'headers': cors_headers,
-            'body': json.dumps({
+            'body': to_json({
                 'userId': user_id,
                 'followers': followers_profiles,
                 'count': len(followers_profiles)
-            }, cls=DecimalEncoder)
+            })
         }
     except Exception as e:
         logger.error(f"Erreur lors de la récupération des followers: {str(e)}")
@@ -466,7 +871,7 @@ def get_followers(user_id, current_user_id, cors_headers):
         return {
             'statusCode': 500,
             'headers': cors_headers,
-            'body': json.dumps({'message': f'Error retrieving followers: {str(e)}'})
+            'body': to_json({'message': f'Error retrieving followers: {str(e)}'})
         }
 
 def get_following(user_id, current_user_id, cors_headers):
@@ -475,30 +880,32 @@ def get_following(user_id, current_user_id, cors_headers):
     """
     try:
         # Vérifier que l'utilisateur existe
-        user_response = users_table.get_item(Key={'userId': user_id})
-        if 'Item' not in user_response:
+        if not user_exists(user_id):
             return {
                 'statusCode': 404,
                 'headers': cors_headers,
-                'body': json.dumps({'message': 'User not found'})
+                'body': to_json({'message': 'User not found'})
             }
             
         # Récupérer les abonnements
-        following_response = follows_table.query(
+        following_items = query_all_items(
+            follows_table,
             IndexName='follower_id-index',
-            KeyConditionExpression=Key('follower_id').eq(user_id)
+            KeyConditionExpression=K_FOLLOWER.eq(user_id),
+            ProjectionExpression='followed_id, created_at'
         )
-        
-        following_items = following_response.get('Items', [])
         followed_ids = [item['followed_id'] for item in following_items]
+        follow_dates = {item['followed_id']: item.get('created_at') for item in following_items}
         
         # Récupérer les informations de profil des utilisateurs suivis
+        profiles_by_id = batch_get_profiles(followed_ids)
+        if current_user_id != user_id:
+            followed_by_current = get_followed_among(current_user_id, followed_ids)
         following_profiles = []
         
         for followed_id in followed_ids:
-            followed_response = users_table.get_item(Key={'userId': followed_id})
-            if 'Item' in followed_response:
-                followed = followed_response['Item']
+            followed = profiles_by_id.get(followed_id)
+            if followed:
                 
                 # Créer un objet profil simplifié
                 profile = {
@@ -509,15 +916,11 @@ def get_following(user_id, current_user_id, cors_headers):
                 }
                 
                 # Ajouter la date de suivi
-                for item in following_items:
-                    if item['followed_id'] == followed_id:
-                        profile['followDate'] = item.get('created_at')
+                profile['followDate'] = follow_dates[followed_id]
                 
                 # Vérifier si l'utilisateur courant suit cette personne
                 if current_user_id != user_id and current_user_id != followed_id:
-                    follow_id = f"{current_user_id}#{followed_id}"
-                    is_following_response = follows_table.get_item(Key={'follow_id': follow_id})
-                    profile['isFollowing'] = 'Item' in is_following_response
+                    profile['isFollowing'] = followed_id in followed_by_current
                 elif current_user_id == user_id:
                     profile['isFollowing'] = True
                 
@@ -530,16 +933,14 @@ def get_following(user_id, current_user_id, cors_headers):
             reverse=True
         )
         
-        logger.info(f"Récupéré {len(following_profiles)} abonnements pour {user_id}")
-        
         return {
             'statusCode': 200,
             'headers': cors_headers,
-            'body': json.dumps({
+            'body': to_json({
                 'userId': user_id,
                 'following': following_profiles,
                 'count': len(following_profiles)
-            }, cls=DecimalEncoder)
+            })
         }
     except Exception as e:
         logger.error(f"Erreur lors de la récupération des abonnements: {str(e)}")
@@ -547,5 +948,5 @@ def get_following(user_id, current_user_id, cors_headers):
         return {
             'statusCode': 500,
             'headers': cors_headers,
-            'body': json.dumps({'message': f'Error retrieving following: {str(e)}'})
+            'body': to_json({'message': f'Error retrieving following: {str(e)}'})
         }
\ No newline at end of file
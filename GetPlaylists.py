@@ -2,9 +2,22 @@ import json
 import boto3
 import logging
 import os
+import random
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from decimal import Decimal
+from botocore.config import Config
 from boto3.dynamodb.conditions import Key
 
+# orjson (extension C) est utilisé pour sérialiser les réponses lorsqu'il est empaqueté
+# avec la Lambda ; sinon on se rabat sur le module json standard
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 # Configuration du logging
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
@@ -13,12 +26,73 @@ logger.setLevel(logging.INFO)
 PLAYLISTS_TABLE = os.environ.get('PLAYLISTS_TABLE', 'chordora-playlists')
 TRACKS_TABLE = os.environ.get('TRACKS_TABLE', 'chordora-tracks')
 S3_BUCKET = os.environ.get('S3_BUCKET', 'chordora-users')
+REDIS_HOST = os.environ.get('REDIS_HOST')
+DEFAULT_ORIGIN = 'http://localhost:3000'
+# Origines CORS autorisées (liste séparée par des virgules) : ALLOWED_ORIGINS doit être défini au
+# déploiement avec les domaines du frontend ; les autres origines reçoivent DEFAULT_ORIGIN
+ALLOWED_ORIGINS = frozenset(
+    origin.strip() for origin in os.environ.get('ALLOWED_ORIGINS', DEFAULT_ORIGIN).split(',') if origin.strip()
+)
+REDIS_RESPONSE_TTL = int(os.environ.get('REDIS_RESPONSE_TTL', '300'))
+
+# Configuration botocore partagée : pool de connexions élargi et keep-alive TCP
+# pour réutiliser les connexions TLS entre invocations d'un même conteneur
+BOTO_CONFIG = Config(
+    max_pool_connections=50,
+    retries={'max_attempts': 3, 'mode': 'adaptive'},
+    tcp_keepalive=True
+)
 
 # Initialisation des clients AWS
-dynamodb = boto3.resource('dynamodb')
+dynamodb = boto3.resource('dynamodb', config=BOTO_CONFIG)
 playlists_table = dynamodb.Table(PLAYLISTS_TABLE)
 tracks_table = dynamodb.Table(TRACKS_TABLE)
-s3 = boto3.client('s3')
+s3 = boto3.client('s3', config=BOTO_CONFIG)
+
+# Cache Redis (ElastiCache) des réponses de lecture des playlists, activé uniquement
+# lorsque REDIS_HOST est défini ; UpdatePlaylist invalide les clés à chaque écriture
+if REDIS_HOST:
+    import redis
+    redis_client = redis.Redis(
+        host=REDIS_HOST,
+        port=int(os.environ.get('REDIS_PORT', '6379')),
+        socket_timeout=0.05,
+        socket_connect_timeout=0.05
+    )
+else:
+    redis_client = None
+
+# Pool de threads réutilisé entre les invocations pour la signature des URLs S3
+EXECUTOR = ThreadPoolExecutor(max_workers=8)
+
+# Cache LRU des URLs présignées partagé entre les invocations d'un même conteneur ;
+# une URL est resservie jusqu'à 5 minutes avant son expiration (marge augmentée de la
+# durée du cache Redis, les réponses mises en cache contenant ces URLs)
+PRESIGNED_URL_EXPIRES_IN = 3600
+PRESIGNED_URL_CACHE_TTL = PRESIGNED_URL_EXPIRES_IN - 300 - (REDIS_RESPONSE_TTL if REDIS_HOST else 0)
+PRESIGNED_URL_CACHE_SIZE = 10000
+presigned_url_cache = OrderedDict()
+presigned_url_cache_lock = threading.Lock()
+
+# Attributs des pistes renvoyés dans les playlists ; les noms passent par des alias
+# pour ne pas entrer en conflit avec les mots réservés de DynamoDB
+PLAYLIST_TRACK_ATTRIBUTES = [
+    'track_id', 'user_id', 'title', 'genre', 'bpm', 'duration', 'mood', 'tags',
+    'file_path', 'cover_image_path', 'isPrivate', 'likes', 'plays', 'created_at'
+]
+PLAYLIST_TRACK_PROJECTION = ', '.join(f'#a{i}' for i in range(len(PLAYLIST_TRACK_ATTRIBUTES)))
+PLAYLIST_TRACK_ATTRIBUTE_NAMES = {f'#a{i}': name for i, name in enumerate(PLAYLIST_TRACK_ATTRIBUTES)}
+
+# Compteurs des pistes, absents de l'instantané tracks_snapshot et toujours lus sur la table
+TRACK_COUNTER_ATTRIBUTES = ['track_id', 'likes', 'plays']
+TRACK_COUNTER_PROJECTION = ', '.join(f'#c{i}' for i in range(len(TRACK_COUNTER_ATTRIBUTES)))
+TRACK_COUNTER_ATTRIBUTE_NAMES = {f'#c{i}': name for i, name in enumerate(TRACK_COUNTER_ATTRIBUTES)}
+
+# Champs S3 des pistes à présigner : attribut contenant la clé -> attribut de l'URL générée
+PRESIGNED_FIELDS = {
+    'file_path': 'presigned_url',
+    'cover_image_path': 'cover_image'
+}
 
 class DecimalEncoder(json.JSONEncoder):
     def default(self, obj):
@@ -26,24 +100,40 @@ class DecimalEncoder(json.JSONEncoder):
             return float(obj)
         return super(DecimalEncoder, self).default(obj)
 
+def decimal_default(obj):
+    """Conversion des décimaux pour orjson"""
+    if isinstance(obj, Decimal):
+        return float(obj)
+    raise TypeError(f"Type {type(obj).__name__} non sérialisable en JSON")
+
+def to_json(payload):
+    """Sérialise le corps d'une réponse en JSON"""
+    if orjson is not None:
+        return orjson.dumps(payload, default=decimal_default).decode()
+    return json.dumps(payload, cls=DecimalEncoder)
+
+# En-têtes CORS communs, construits une seule fois par conteneur
+BASE_CORS_HEADERS = {
+    'Access-Control-Allow-Headers': 'Content-Type,X-Amz-Date,Authorization,X-Api-Key,X-Amz-Security-Token',
+    'Access-Control-Allow-Methods': 'GET,OPTIONS',
+    'Access-Control-Allow-Credentials': 'true'
+}
+
 def get_cors_headers(event):
-    """Renvoie les en-têtes CORS en fonction de l'origine de la requête"""
-    origin = None
-    if 'headers' in event and event['headers']:
-        origin = event['headers'].get('origin') or event['headers'].get('Origin')
-    
-    allowed_origin = origin if origin else 'http://localhost:3000'
-    
-    return {
-        'Access-Control-Allow-Origin': allowed_origin,
-        'Access-Control-Allow-Headers': 'Content-Type,X-Amz-Date,Authorization,X-Api-Key,X-Amz-Security-Token',
-        'Access-Control-Allow-Methods': 'GET,OPTIONS',
-        'Access-Control-Allow-Credentials': 'true'
-    }
+    """
+    Renvoie les en-têtes CORS en fonction de l'origine de la requête ; seules les origines
+    autorisées sont renvoyées, les autres reçoivent l'origine par défaut
+    """
+    headers = event.get('headers') or {}
+    origin = headers.get('origin') or headers.get('Origin')
+    allowed_origin = origin if origin in ALLOWED_ORIGINS else DEFAULT_ORIGIN
+    return {**BASE_CORS_HEADERS, 'Access-Control-Allow-Origin': allowed_origin}
 
 def lambda_handler(event, context):
     """Gestionnaire principal de la Lambda"""
-    logger.info(f"Événement reçu: {json.dumps(event)}")
+    # Ne sérialiser l'événement complet que si le niveau DEBUG est actif
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Événement reçu: %s", json.dumps(event))
     cors_headers = get_cors_headers(event)
     
     # Gestion des requêtes OPTIONS (pre-flight CORS)
@@ -51,7 +141,7 @@ def lambda_handler(event, context):
         return {
             'statusCode': 200,
             'headers': cors_headers,
-            'body': json.dumps('Preflight request successful')
+            'body': to_json('Preflight request successful')
         }
     
     try:
@@ -78,7 +168,7 @@ def lambda_handler(event, context):
             return {
                 'statusCode': 400,
                 'headers': cors_headers,
-                'body': json.dumps({'message': 'User ID is required either as userId query parameter or from authentication'})
+                'body': to_json({'message': 'User ID is required either as userId query parameter or from authentication'})
             }
         
         logger.info(f"Récupération des playlists de l'utilisateur: {user_id}")
@@ -91,12 +181,48 @@ def lambda_handler(event, context):
         return {
             'statusCode': 500,
             'headers': cors_headers,
-            'body': json.dumps({'message': f'Internal server error: {str(e)}'})
+            'body': to_json({'message': f'Internal server error: {str(e)}'})
         }
 
+def user_playlists_cache_key(user_id, is_owner, include_tracks):
+    """Clé Redis de la liste des playlists d'un utilisateur, distincte selon la visibilité"""
+    scope = 'owner' if is_owner else 'public'
+    detail = 'tracks' if include_tracks else 'summary'
+    return f"upl:{user_id}:{scope}:{detail}"
+
+def get_cached_response(cache_key):
+    """Lit un corps de réponse depuis Redis ; None en cas d'absence ou d'indisponibilité"""
+    if redis_client is None:
+        return None
+    try:
+        cached = redis_client.get(cache_key)
+    except redis.RedisError as e:
+        logger.warning(f"Cache Redis indisponible: {str(e)}")
+        return None
+    return cached.decode() if cached is not None else None
+
+def set_cached_response(cache_key, body):
+    """Enregistre un corps de réponse dans Redis pour REDIS_RESPONSE_TTL secondes"""
+    if redis_client is None:
+        return
+    try:
+        redis_client.setex(cache_key, REDIS_RESPONSE_TTL, body)
+    except redis.RedisError as e:
+        logger.warning(f"Impossible d'alimenter le cache Redis: {str(e)}")
+
 def get_playlist_by_id(playlist_id, auth_user_id, cors_headers):
     """Récupère une playlist spécifique par son ID"""
     try:
+        # Seules les playlists publiques sont mises en cache : la réponse est la même pour tous
+        cache_key = f"pl:{playlist_id}"
+        cached_body = get_cached_response(cache_key)
+        if cached_body is not None:
+            return {
+                'statusCode': 200,
+                'headers': cors_headers,
+                'body': cached_body
+            }
+        
         # Récupérer les informations de la playlist
         response = playlists_table.get_item(Key={'playlist_id': playlist_id})
         
@@ -104,7 +230,7 @@ def get_playlist_by_id(playlist_id, auth_user_id, cors_headers):
             return {
                 'statusCode': 404,
                 'headers': cors_headers,
-                'body': json.dumps({'message': 'Playlist not found'})
+                'body': to_json({'message': 'Playlist not found'})
             }
         
         playlist = response['Item']
@@ -114,19 +240,20 @@ def get_playlist_by_id(playlist_id, auth_user_id, cors_headers):
             return {
                 'statusCode': 403,
                 'headers': cors_headers,
-                'body': json.dumps({'message': 'Access denied to private playlist'})
+                'body': to_json({'message': 'Access denied to private playlist'})
             }
         
         # Récupérer les pistes de la playlist
-        if 'track_ids' in playlist and playlist['track_ids']:
-            playlist['tracks'] = get_tracks_by_ids(playlist['track_ids'], playlist.get('track_positions', {}))
-        else:
-            playlist['tracks'] = []
+        attach_playlists_tracks([playlist])
+        
+        body = to_json(playlist)
+        if playlist.get('is_public', True):
+            set_cached_response(cache_key, body)
         
         return {
             'statusCode': 200,
             'headers': cors_headers,
-            'body': json.dumps(playlist, cls=DecimalEncoder)
+            'body': body
         }
     
     except Exception as e:
@@ -136,12 +263,25 @@ def get_playlist_by_id(playlist_id, auth_user_id, cors_headers):
         return {
             'statusCode': 500,
             'headers': cors_headers,
-            'body': json.dumps({'message': f'Error retrieving playlist: {str(e)}'})
+            'body': to_json({'message': f'Error retrieving playlist: {str(e)}'})
         }
 
 def get_user_playlists(user_id, auth_user_id, cors_headers, query_params):
     """Récupère toutes les playlists d'un utilisateur"""
     try:
+        # Déterminer si on doit inclure les pistes dans la réponse
+        include_tracks = 'includeTracks' in query_params and query_params['includeTracks'].lower() == 'true'
+        is_owner = user_id == auth_user_id
+        
+        cache_key = user_playlists_cache_key(user_id, is_owner, include_tracks)
+        cached_body = get_cached_response(cache_key)
+        if cached_body is not None:
+            return {
+                'statusCode': 200,
+                'headers': cors_headers,
+                'body': cached_body
+            }
+        
         # Requête pour les playlists de l'utilisateur
         response = playlists_table.query(
             IndexName='user_id-index',
@@ -151,26 +291,25 @@ def get_user_playlists(user_id, auth_user_id, cors_headers, query_params):
         playlists = response.get('Items', [])
         
         # Filtrer les playlists privées si l'utilisateur n'est pas le propriétaire
-        if user_id != auth_user_id:
+        if not is_owner:
             playlists = [p for p in playlists if p.get('is_public', True)]
         
-        # Déterminer si on doit inclure les pistes dans la réponse
-        include_tracks = 'includeTracks' in query_params and query_params['includeTracks'].lower() == 'true'
-        
         if include_tracks:
+            attach_playlists_tracks(playlists)
+        else:
             for playlist in playlists:
-                if 'track_ids' in playlist and playlist['track_ids']:
-                    playlist['tracks'] = get_tracks_by_ids(playlist['track_ids'], playlist.get('track_positions', {}))
-                else:
-                    playlist['tracks'] = []
+                playlist.pop('tracks_snapshot', None)
+        
+        body = to_json({
+            'playlists': playlists,
+            'count': len(playlists)
+        })
+        set_cached_response(cache_key, body)
         
         return {
             'statusCode': 200,
             'headers': cors_headers,
-            'body': json.dumps({
-                'playlists': playlists,
-                'count': len(playlists)
-            }, cls=DecimalEncoder)
+            'body': body
         }
     
     except Exception as e:
@@ -180,77 +319,152 @@ def get_user_playlists(user_id, auth_user_id, cors_headers, query_params):
         return {
             'statusCode': 500,
             'headers': cors_headers,
-            'body': json.dumps({'message': f'Error retrieving user playlists: {str(e)}'})
+            'body': to_json({'message': f'Error retrieving user playlists: {str(e)}'})
         }
 
-def get_tracks_by_ids(track_ids, track_positions):
-    """Récupère plusieurs pistes par leurs IDs et ajoute leurs positions"""
+def presign(s3_key):
+    """Renvoie une URL présignée pour la clé S3, depuis le cache tant qu'elle reste valide"""
+    now = time.time()
+    with presigned_url_cache_lock:
+        cached = presigned_url_cache.get(s3_key)
+        if cached and cached[1] > now:
+            presigned_url_cache.move_to_end(s3_key)
+            return cached[0]
+    
+    url = s3.generate_presigned_url(
+        'get_object',
+        Params={'Bucket': S3_BUCKET, 'Key': s3_key},
+        ExpiresIn=PRESIGNED_URL_EXPIRES_IN
+    )
+    with presigned_url_cache_lock:
+        presigned_url_cache[s3_key] = (url, now + PRESIGNED_URL_CACHE_TTL)
+        presigned_url_cache.move_to_end(s3_key)
+        while len(presigned_url_cache) > PRESIGNED_URL_CACHE_SIZE:
+            presigned_url_cache.popitem(last=False)
+    return url
+
+def presign_key(s3_key):
+    """Génère l'URL présignée d'une clé S3 ; None en cas d'erreur"""
     try:
-        if not track_ids:
-            return []
-        
-        tracks_with_details = []
-        
-        # BatchGetItem est limité à 100 éléments, donc on divise en chunks si nécessaire
-        chunk_size = 100
-        for i in range(0, len(track_ids), chunk_size):
-            chunk_ids = track_ids[i:i + chunk_size]
-            keys = [{'track_id': id} for id in chunk_ids]
-            
-            batch_response = dynamodb.batch_get_item(
-                RequestItems={
-                    TRACKS_TABLE: {
-                        'Keys': keys
-                    }
-                }
-            )
-            
-            # Récupérer les pistes retournées
-            if TRACKS_TABLE in batch_response.get('Responses', {}):
-                tracks_batch = batch_response['Responses'][TRACKS_TABLE]
-                
-                for track in tracks_batch:
-                    # Ajouter la position depuis track_positions
-                    track_id = track['track_id']
-                    track['position'] = track_positions.get(track_id, 0)
-                    
-                    # Générer des URLs présignées pour l'audio
-                    if 'file_path' in track:
-                        try:
-                            presigned_url = s3.generate_presigned_url(
-                                'get_object',
-                                Params={'Bucket': S3_BUCKET, 'Key': track['file_path']},
-                                ExpiresIn=3600
-                            )
-                            track['presigned_url'] = presigned_url
-                        except Exception as e:
-                            logger.error(f"Erreur lors de la génération de l'URL présignée pour {track['track_id']}: {str(e)}")
-                    
-                    # Générer des URLs présignées pour les images de couverture
-                    if 'cover_image_path' in track:
-                        try:
-                            cover_url = s3.generate_presigned_url(
-                                'get_object',
-                                Params={'Bucket': S3_BUCKET, 'Key': track['cover_image_path']},
-                                ExpiresIn=3600
-                            )
-                            track['cover_image'] = cover_url
-                        except Exception as e:
-                            logger.error(f"Erreur lors de la génération de l'URL de couverture pour {track['track_id']}: {str(e)}")
-                    
-                    tracks_with_details.append(track)
-        
-        # Trier les pistes en fonction de l'ordre dans track_ids
-        sorted_tracks = []
-        for track_id in track_ids:
-            track = next((t for t in tracks_with_details if t['track_id'] == track_id), None)
-            if track:
-                sorted_tracks.append(track)
+        return presign(s3_key)
+    except Exception as e:
+        logger.error(f"Erreur lors de la génération de l'URL présignée pour {s3_key}: {str(e)}")
+        return None
+
+def batch_get_all(request_items, max_attempts=5):
+    """
+    Exécute un BatchGetItem en resoumettant les UnprocessedKeys (throttling, réponse
+    partielle) avec un backoff exponentiel aléatoire.
+    Retourne un dictionnaire table -> éléments lus
+    """
+    items = {}
+    remaining = request_items
+    for attempt in range(max_attempts):
+        response = dynamodb.batch_get_item(RequestItems=remaining)
+        for table_name, table_items in response.get('Responses', {}).items():
+            items.setdefault(table_name, []).extend(table_items)
         
-        return sorted_tracks
+        remaining = response.get('UnprocessedKeys')
+        if not remaining:
+            return items
+        time.sleep(random.uniform(0, 0.05 * 2 ** attempt))
+    
+    logger.warning(f"Clés non traitées après {max_attempts} tentatives: {sum(len(r['Keys']) for r in remaining.values())}")
+    return items
+
+def fetch_tracks(track_ids, projection=PLAYLIST_TRACK_PROJECTION, attribute_names=PLAYLIST_TRACK_ATTRIBUTE_NAMES):
+    """
+    Récupère les pistes dont les IDs sont donnés (doublons ignorés), limitées aux attributs
+    de la projection. Retourne un dictionnaire track_id -> piste
+    """
+    unique_ids = list(dict.fromkeys(track_ids))
+    
+    # BatchGetItem est limité à 100 éléments : les chunks sont lus en parallèle
+    chunk_size = 100
+    chunks = [unique_ids[i:i + chunk_size] for i in range(0, len(unique_ids), chunk_size)]
+    
+    def fetch_chunk(chunk_ids):
+        return batch_get_all({
+            TRACKS_TABLE: {
+                'Keys': [{'track_id': id} for id in chunk_ids],
+                'ProjectionExpression': projection,
+                'ExpressionAttributeNames': attribute_names
+            }
+        }).get(TRACKS_TABLE, [])
     
+    return {
+        track['track_id']: track
+        for tracks_batch in EXECUTOR.map(fetch_chunk, chunks)
+        for track in tracks_batch
+    }
+
+def presign_tracks(tracks):
+    """
+    Génère en parallèle les URLs présignées de l'audio et des images de couverture,
+    une seule fois par clé S3 distincte
+    """
+    s3_keys = list(dict.fromkeys(
+        track[key_field]
+        for track in tracks
+        for key_field in PRESIGNED_FIELDS
+        if track.get(key_field)
+    ))
+    urls = dict(zip(s3_keys, EXECUTOR.map(presign_key, s3_keys)))
+    for track in tracks:
+        for key_field, url_field in PRESIGNED_FIELDS.items():
+            url = urls.get(track.get(key_field))
+            if url:
+                track[url_field] = url
+
+def order_playlist_tracks(track_ids, track_positions, tracks_by_id):
+    """Renvoie les pistes dans l'ordre de track_ids, chacune annotée de sa position dans la playlist"""
+    return [
+        {**tracks_by_id[track_id], 'position': track_positions.get(track_id, 0)}
+        for track_id in track_ids
+        if track_id in tracks_by_id
+    ]
+
+def attach_playlists_tracks(playlists):
+    """
+    Ajoute leurs pistes à une ou plusieurs playlists. Les playlists portant un instantané
+    tracks_snapshot (écrit par UpdatePlaylist) ne relisent que les compteurs likes / plays de
+    leurs pistes ; les autres sont hydratées par une lecture groupée complète. Les playlists
+    vides ne déclenchent aucun appel DynamoDB/S3
+    """
+    snapshot_tracks = {}
+    missing_track_ids = []
+    for playlist in playlists:
+        snapshot = playlist.pop('tracks_snapshot', None)
+        if snapshot is not None:
+            snapshot_tracks.update((track['track_id'], track) for track in snapshot)
+        else:
+            missing_track_ids.extend(playlist.get('track_ids') or [])
+    
+    tracks_by_id = {}
+    try:
+        if missing_track_ids:
+            tracks_by_id.update(fetch_tracks(missing_track_ids))
+        
+        # Compteurs lus sur la table ; une piste absente a été supprimée et n'est pas renvoyée
+        snapshot_ids = [track_id for track_id in snapshot_tracks if track_id not in tracks_by_id]
+        if snapshot_ids:
+            counters = fetch_tracks(snapshot_ids, TRACK_COUNTER_PROJECTION, TRACK_COUNTER_ATTRIBUTE_NAMES)
+            for track_id in snapshot_ids:
+                if track_id in counters:
+                    track = snapshot_tracks[track_id]
+                    track.pop('likes', None)
+                    track.pop('plays', None)
+                    track.update(counters[track_id])
+                    tracks_by_id[track_id] = track
+        presign_tracks(list(tracks_by_id.values()))
     except Exception as e:
         logger.error(f"Erreur lors de la récupération des pistes: {str(e)}")
         import traceback
         logger.error(traceback.format_exc())
-        return []
\ No newline at end of file
+    
+    for playlist in playlists:
+        playlist['tracks'] = order_playlist_tracks(
+            playlist.get('track_ids') or [],
+            playlist.get('track_positions', {}),
+            tracks_by_id
+        )
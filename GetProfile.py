@@ -1,11 +1,24 @@
+import hashlib
+import hmac
 import json
 import os
 import boto3
-import base64
 import logging
-from decimal import Decimal
+import random
+import time
 import traceback
-from datetime import datetime, timedelta
+from collections import OrderedDict
+from urllib.parse import quote, unquote, urlsplit
+from botocore.config import Config
+from boto3.dynamodb.types import TypeDeserializer
+from decimal import Decimal
+
+# orjson (extension C) est utilisé pour sérialiser les réponses lorsqu'il est empaqueté
+# avec la Lambda ; sinon on se rabat sur le module json standard
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 # Configuration du logging
 logger = logging.getLogger()
@@ -16,158 +29,264 @@ TABLE_NAME = os.environ.get('USERS_TABLE', 'chordora-users')
 BUCKET_NAME = os.environ.get('BUCKET_NAME', 'chordora-users')
 DEFAULT_IMAGE_KEY = os.environ.get('DEFAULT_IMAGE_KEY', 'public/default-profile.jpg')
 AWS_REGION = os.environ.get('AWS_REGION', 'us-east-1')
+DEFAULT_ORIGIN = 'http://localhost:3000'
+
+# Préfixe des URLs d'objets S3 stockées dans les profils, dont on extrait la clé
+S3_OBJECT_URL_PREFIX = f"https://{BUCKET_NAME}.s3.{AWS_REGION}.amazonaws.com/"
+# Origines CORS autorisées (liste séparée par des virgules) : ALLOWED_ORIGINS doit être défini au
+# déploiement avec les domaines du frontend ; les autres origines reçoivent DEFAULT_ORIGIN
+ALLOWED_ORIGINS = frozenset(
+    origin.strip() for origin in os.environ.get('ALLOWED_ORIGINS', DEFAULT_ORIGIN).split(',') if origin.strip()
+)
+
+# Configuration botocore partagée : pool de connexions borné et keep-alive TCP
+# pour réutiliser les connexions TLS entre invocations d'un même conteneur
+BOTO_CONFIG = Config(
+    max_pool_connections=50,
+    retries={'max_attempts': 3, 'mode': 'adaptive'},
+    tcp_keepalive=True
+)
 
 # Initialisation des clients AWS
-dynamodb = boto3.resource('dynamodb')
-table = dynamodb.Table(TABLE_NAME)
-s3 = boto3.client('s3')
-s3_resource = boto3.resource('s3')
-
-class DecimalEncoder(json.JSONEncoder):
-    def default(self, obj):
-        if isinstance(obj, Decimal):
-            return float(obj)
-        return super(DecimalEncoder, self).default(obj)
-
-def generate_presigned_url(bucket, object_key, expiration=3600):
+# Client DynamoDB bas niveau : les éléments sont désérialisés en une passe par
+# deserialize_item, sans la couche resource
+dynamodb_client = boto3.client('dynamodb', config=BOTO_CONFIG)
+deserializer = TypeDeserializer()
+
+# Attributs du profil lus dans DynamoDB ; les noms passent par des alias pour ne pas
+# entrer en conflit avec les mots réservés (location, ...)
+PROFILE_ATTRIBUTES = [
+    'userId', 'email', 'username', 'bio', 'userType', 'experienceLevel', 'location',
+    'software', 'musicalMood', 'availabilityStatus', 'musicGenres', 'tags', 'equipment',
+    'favoriteArtists', 'profileImageUrl', 'bannerImageUrl', 'socialLinks',
+    'profileCompleted', 'createdAt', 'updatedAt'
+]
+PROFILE_PROJECTION = ', '.join(f'#a{i}' for i in range(len(PROFILE_ATTRIBUTES)))
+PROFILE_ATTRIBUTE_NAMES = {f'#a{i}': name for i, name in enumerate(PROFILE_ATTRIBUTES)}
+
+# Gabarit du profil renvoyé : valeurs par défaut immuables, dans l'ordre de la réponse.
+# profileImageUrl n'est jamais recopié tel quel (une URL présignée est générée)
+PROFILE_TEMPLATE = {
+    'userId': '', 'email': '', 'username': '', 'bio': '', 'userType': '',
+    'experienceLevel': '', 'location': '', 'software': '', 'musicalMood': '',
+    'availabilityStatus': '', 'musicGenres': None, 'tags': None, 'equipment': None,
+    'favoriteArtists': None, 'profileImageUrl': '', 'bannerImageUrl': '',
+    'socialLinks': None, 'profileCompleted': False, 'createdAt': 0, 'updatedAt': 0
+}
+PROFILE_COPIED_FIELDS = tuple(key for key in PROFILE_TEMPLATE if key != 'profileImageUrl')
+PROFILE_MUTABLE_DEFAULTS = {
+    'musicGenres': list, 'tags': list, 'equipment': list, 'favoriteArtists': list,
+    'socialLinks': dict
+}
+
+# Nombre maximal de profils par lecture groupée (limite d'un appel BatchGetItem)
+MAX_BATCH_PROFILES = 100
+
+class S3UrlSigner:
     """
-    Génère une URL présignée pour accéder à un objet S3
+    Signature SigV4 locale des URLs GET d'un bucket S3 (signature en paramètres de requête).
+    Équivalent de s3.generate_presigned_url sans la pile de modèles et d'événements botocore :
+    la clé de signature dérivée est mise en cache par jour et par clé d'accès
     """
-    try:
-        # Vérifier si l'objet existe avant de générer l'URL
-        try:
-            s3_resource.Object(bucket, object_key).load()
-        except Exception as e:
-            logger.warning(f"L'objet S3 {object_key} n'existe pas: {str(e)}")
-            return None
-            
-        # Générer l'URL présignée
-        response = s3.generate_presigned_url(
-            'get_object',
-            Params={
-                'Bucket': bucket,
-                'Key': object_key
-            },
-            ExpiresIn=expiration
+    def __init__(self, credentials, bucket, region):
+        self.credentials = credentials
+        self.region = region
+        self.host = f"{bucket}.s3.{region}.amazonaws.com"
+        self._signing_keys = {}
+
+    def _signing_key(self, secret_key, access_key, datestamp):
+        cache_key = (access_key, datestamp)
+        signing_key = self._signing_keys.get(cache_key)
+        if signing_key is None:
+            signing_key = f"AWS4{secret_key}".encode()
+            for part in (datestamp, self.region, 's3', 'aws4_request'):
+                signing_key = hmac.new(signing_key, part.encode(), hashlib.sha256).digest()
+            # Une seule clé utile à la fois (changement de jour ou rotation des identifiants)
+            self._signing_keys = {cache_key: signing_key}
+        return signing_key
+
+    def presign(self, object_key, expires_in=3600, params=None, now=None):
+        """
+        Renvoie l'URL présignée GET de object_key ; params ajoute des paramètres signés
+        (ex. response-content-type)
+        """
+        # Identifiants figés à chaque appel : suit le renouvellement des identifiants temporaires
+        credentials = self.credentials.get_frozen_credentials()
+        amz_date = time.strftime('%Y%m%dT%H%M%SZ', time.gmtime(now))
+        datestamp = amz_date[:8]
+        scope = f"{datestamp}/{self.region}/s3/aws4_request"
+        
+        query = {
+            'X-Amz-Algorithm': 'AWS4-HMAC-SHA256',
+            'X-Amz-Credential': f"{credentials.access_key}/{scope}",
+            'X-Amz-Date': amz_date,
+            'X-Amz-Expires': str(expires_in),
+            'X-Amz-SignedHeaders': 'host'
+        }
+        if credentials.token:
+            query['X-Amz-Security-Token'] = credentials.token
+        if params:
+            query.update(params)
+        
+        canonical_uri = '/' + quote(object_key, safe='/~')
+        canonical_query = '&'.join(
+            f"{quote(name, safe='-_.~')}={quote(value, safe='-_.~')}" for name, value in sorted(query.items())
+        )
+        canonical_request = f"GET\n{canonical_uri}\n{canonical_query}\nhost:{self.host}\n\nhost\nUNSIGNED-PAYLOAD"
+        string_to_sign = (
+            f"AWS4-HMAC-SHA256\n{amz_date}\n{scope}\n"
+            f"{hashlib.sha256(canonical_request.encode()).hexdigest()}"
         )
-        logger.info(f"URL présignée générée pour {object_key}: {response[:100]}...")
+        signature = hmac.new(
+            self._signing_key(credentials.secret_key, credentials.access_key, datestamp),
+            string_to_sign.encode(),
+            hashlib.sha256
+        ).hexdigest()
+        return f"https://{self.host}{canonical_uri}?{canonical_query}&X-Amz-Signature={signature}"
+
+# Les URLs présignées sont signées localement : aucun client S3 n'est nécessaire
+signer = S3UrlSigner(boto3.Session().get_credentials(), BUCKET_NAME, AWS_REGION)
+
+# Cache LRU des URLs présignées (par clé d'objet) partagé entre les invocations d'un même conteneur ;
+# une URL est resservie jusqu'à 5 minutes avant l'expiration de sa signature
+PRESIGNED_URL_CACHE_MARGIN = 300
+PRESIGNED_URL_CACHE_SIZE = 4096
+presigned_url_cache = OrderedDict()
+
+def generate_presigned_url(object_key, expiration=3600):
+    """
+    Génère une URL présignée pour accéder à un objet du bucket des profils
+    """
+    try:
+        # La signature est calculée localement : aucune vérification d'existence (HEAD)
+        # n'est faite, le client affiche l'image par défaut si l'objet est absent
+        now = time.time()
+        cached = presigned_url_cache.get(object_key)
+        if cached and cached[1] > now:
+            presigned_url_cache.move_to_end(object_key)
+            return cached[0]
+        
+        response = signer.presign(object_key, expiration, now=now)
+        logger.info("URL présignée générée pour %s: %s...", object_key, response[:100])
+        
+        presigned_url_cache[object_key] = (response, now + expiration - PRESIGNED_URL_CACHE_MARGIN)
+        presigned_url_cache.move_to_end(object_key)
+        while len(presigned_url_cache) > PRESIGNED_URL_CACHE_SIZE:
+            presigned_url_cache.popitem(last=False)
         return response
     except Exception as e:
         logger.error(f"Erreur lors de la génération de l'URL présignée: {str(e)}")
         logger.error(traceback.format_exc())
         return None
 
-def check_image_exists(bucket, user_id):
+def decimal_default(obj):
+    """Conversion des décimaux restants (nombres imbriqués) lors de la sérialisation"""
+    if isinstance(obj, Decimal):
+        return int(obj) if obj == obj.to_integral_value() else float(obj)
+    raise TypeError(f"Type {type(obj).__name__} non sérialisable en JSON")
+
+def to_json(payload):
+    """Sérialise le corps d'une réponse en JSON compact"""
+    if orjson is not None:
+        return orjson.dumps(payload, default=decimal_default).decode()
+    return json.dumps(payload, default=decimal_default, separators=(',', ':'))
+
+def deserialize_item(item):
+    """Convertit un élément au format AttributeValue en dictionnaire Python"""
+    return {key: deserializer.deserialize(value) for key, value in item.items()}
+
+def resolve_profile_image_url(item):
     """
-    Vérifie si une image de profil existe pour l'utilisateur et retourne son chemin
+    Renvoie l'URL présignée de l'image de profil d'un élément DynamoDB,
+    ou celle de l'image par défaut ('' si aucune ne peut être générée)
     """
-    try:
-        # Tester différentes extensions de fichier possibles
-        for ext in ['.jpg', '.png', '.jpeg', '.webp', '.gif', '']:
-            profile_image_key = f"public/users/{user_id}/profile-image{ext}"
-            try:
-                s3_resource.Object(bucket, profile_image_key).load()
-                logger.info(f"Image de profil trouvée: {profile_image_key}")
-                return profile_image_key
-            except Exception:
-                continue  # Essayer l'extension suivante
-        
-        logger.info(f"Aucune image de profil trouvée pour l'utilisateur {user_id}")
-        return None
-    except Exception as e:
-        logger.error(f"Erreur lors de la vérification de l'image: {str(e)}")
-        return None
+    user_id = item.get('userId', '')
+    image_url = ''
+    
+    # Déterminer la clé de l'image de profil à partir du chemin stocké, qui fait autorité
+    profile_image_key = None
+    stored_url = item.get('profileImageUrl')
+    if stored_url:
+        # Extraire le chemin S3 de l'URL stockée (forme écrite par UpdateProfile en priorité).
+        # La chaîne de requête d'une URL déjà présignée est ignorée et le chemin décodé,
+        # la clé étant re-signée (signature locale et mise en cache)
+        if stored_url.startswith(S3_OBJECT_URL_PREFIX):
+            profile_image_key = unquote(stored_url[len(S3_OBJECT_URL_PREFIX):].split('?', 1)[0])
+        elif BUCKET_NAME in stored_url and 'amazonaws.com' in stored_url:
+            parsed_url = urlsplit(stored_url)
+            object_path = unquote(parsed_url.path).lstrip('/')
+            if parsed_url.netloc.startswith(f"{BUCKET_NAME}.s3"):
+                # Adresse virtual-host, autre région ou point de terminaison global
+                profile_image_key = object_path
+            elif object_path.startswith(f"{BUCKET_NAME}/"):
+                # Adresse path-style : s3.<région>.amazonaws.com/<bucket>/<clé>
+                profile_image_key = object_path[len(BUCKET_NAME) + 1:]
+        else:
+            # Si ce n'est pas une URL S3 classique, utiliser comme clé directement
+            profile_image_key = stored_url
+    
+    # Générer l'URL présignée ou utiliser l'image par défaut
+    if profile_image_key:
+        # Générer l'URL présignée pour cette image
+        presigned_url = generate_presigned_url(profile_image_key)
+        if presigned_url:
+            image_url = presigned_url
+            logger.info("URL présignée générée pour %s: %s...", user_id, presigned_url[:50])
+        else:
+            logger.error(f"Impossible de générer une URL présignée pour {profile_image_key}")
+            # Utiliser l'image par défaut en cas d'échec
+            presigned_url = generate_presigned_url(DEFAULT_IMAGE_KEY)
+            if presigned_url:
+                image_url = presigned_url
+    else:
+        # Utiliser l'image par défaut
+        presigned_url = generate_presigned_url(DEFAULT_IMAGE_KEY)
+        if presigned_url:
+            image_url = presigned_url
+            logger.info("URL de l'image par défaut utilisée pour %s", user_id)
+    
+    return image_url
 
-def convert_dynamodb_to_profile(item):
+def compute_profile_etag(item, image_url):
+    """
+    ETag d'un profil : dépend de updatedAt (modification du profil) et de l'URL présignée
+    servie, afin qu'une réponse mise en cache par le client n'expose pas une URL expirée
+    """
+    fingerprint = f"{item.get('userId', '')}:{item.get('updatedAt', 0)}:{image_url}"
+    return '"' + hashlib.blake2b(fingerprint.encode(), digest_size=8).hexdigest() + '"'
+
+def default_username(user_id):
+    """Nom affiché lorsque le profil n'a pas de username : suffixe de l'ID ou 'User_anon'"""
+    if isinstance(user_id, str) and user_id:
+        return f"User_{user_id[-6:]}"
+    return 'User_anon'
+
+def convert_dynamodb_to_profile(item, image_url=None):
     """
     Convertit un élément DynamoDB en profil utilisateur structuré.
     Gère à la fois les objets DynamoDB natifs et les dictionnaires JSON standards.
     """
     try:
-        # Vérifier si l'item est déjà au format dictionnaire standard
-        profile = {}
-        
-        # Champs de base
-        profile['userId'] = item.get('userId', '')
-        profile['email'] = item.get('email', '')
-        profile['username'] = item.get('username', '') or f"User_{profile['userId'][-6:]}"
-        profile['bio'] = item.get('bio', '')
-        profile['userType'] = item.get('userType', '')
-        profile['experienceLevel'] = item.get('experienceLevel', '')
-        profile['location'] = item.get('location', '')
-        profile['software'] = item.get('software', '')
-        profile['musicalMood'] = item.get('musicalMood', '')
-        
-        # Statut de disponibilité
-        profile['availabilityStatus'] = item.get('availabilityStatus', '')
+        # Partir du gabarit (valeurs par défaut immuables, ordre des champs de la réponse)
+        # puis recopier en une passe les champs présents dans l'élément
+        profile = dict(PROFILE_TEMPLATE)
+        profile.update((key, item[key]) for key in PROFILE_COPIED_FIELDS if key in item)
         
-        # Champs de type liste
-        profile['musicGenres'] = item.get('musicGenres', [])
-        profile['tags'] = item.get('tags', [])
-        profile['equipment'] = item.get('equipment', [])
-        profile['favoriteArtists'] = item.get('favoriteArtists', [])
+        # Valeurs par défaut mutables : une nouvelle instance par profil
+        for key, factory in PROFILE_MUTABLE_DEFAULTS.items():
+            if key not in item:
+                profile[key] = factory()
         
-        # Champs d'URLs et d'images
-        # Ne pas utiliser directement l'URL stockée, mais générer une URL présignée
-        profile['profileImageUrl'] = ''  # On va la remplir ci-dessous
-        profile['profileImageBase64'] = item.get('profileImageBase64', '')
-        profile['bannerImageUrl'] = item.get('bannerImageUrl', '')
+        if not profile['username']:
+            profile['username'] = default_username(profile['userId'])
         
-        # Liens sociaux
-        profile['socialLinks'] = item.get('socialLinks', {})
-        
-        # Flags et timestamps
-        profile['profileCompleted'] = item.get('profileCompleted', False)
-        profile['createdAt'] = item.get('createdAt', 0)
-        profile['updatedAt'] = item.get('updatedAt', 0)
+        # Les timestamps sont convertis en int dès ici (Decimal côté DynamoDB) afin que la
+        # sérialisation reste dans l'encodeur C de json
+        profile['createdAt'] = int(profile['createdAt'])
+        profile['updatedAt'] = int(profile['updatedAt'])
         
         # Générer une URL présignée pour l'image de profil
-        user_id = profile['userId']
-        
-        # Vérifier si l'utilisateur a une image de profil (utiliser le chemin stocké ou chercher)
-        profile_image_key = None
-        if 'profileImageUrl' in item and item['profileImageUrl']:
-            # Essayer d'extraire le chemin S3 de l'URL stockée
-            try:
-                stored_url = item['profileImageUrl']
-                if BUCKET_NAME in stored_url and 'amazonaws.com' in stored_url:
-                    # Extraire la clé du chemin complet
-                    parts = stored_url.split(f"{BUCKET_NAME}.s3.{AWS_REGION}.amazonaws.com/")
-                    if len(parts) > 1:
-                        profile_image_key = parts[1]
-                        logger.info(f"Clé d'image extraite de l'URL stockée: {profile_image_key}")
-                else:
-                    # Si ce n'est pas une URL S3 classique, utiliser comme clé directement
-                    profile_image_key = stored_url
-                    logger.info(f"Utilisation de l'URL stockée comme clé: {profile_image_key}")
-            except Exception as e:
-                logger.error(f"Erreur lors de l'extraction de la clé S3: {str(e)}")
-                # On continuera avec la recherche ci-dessous
-        
-        # Si on n'a pas pu extraire la clé, essayer de chercher l'image
-        if not profile_image_key:
-            profile_image_key = check_image_exists(BUCKET_NAME, user_id)
-            logger.info(f"Résultat de la recherche d'image: {profile_image_key}")
-        
-        # Générer l'URL présignée ou utiliser l'image par défaut
-        if profile_image_key:
-            # Générer l'URL présignée pour cette image
-            presigned_url = generate_presigned_url(BUCKET_NAME, profile_image_key)
-            if presigned_url:
-                profile['profileImageUrl'] = presigned_url
-                logger.info(f"URL présignée générée pour {user_id}: {presigned_url[:50]}...")
-            else:
-                logger.error(f"Impossible de générer une URL présignée pour {profile_image_key}")
-                # Utiliser l'image par défaut en cas d'échec
-                presigned_url = generate_presigned_url(BUCKET_NAME, DEFAULT_IMAGE_KEY)
-                if presigned_url:
-                    profile['profileImageUrl'] = presigned_url
-        else:
-            # Utiliser l'image par défaut
-            presigned_url = generate_presigned_url(BUCKET_NAME, DEFAULT_IMAGE_KEY)
-            if presigned_url:
-                profile['profileImageUrl'] = presigned_url
-                logger.info(f"URL de l'image par défaut utilisée pour {user_id}")
+        profile['profileImageUrl'] = image_url if image_url is not None else resolve_profile_image_url(item)
         
         return profile
     except Exception as e:
@@ -178,46 +297,117 @@ def convert_dynamodb_to_profile(item):
         return {
             'userId': user_id,
             'email': 'error@conversion.failed',
-            'username': f"User_{user_id[-6:]}",
+            'username': default_username(user_id),
             'profileCompleted': False
         }
 
-def get_cors_headers(event):
+def batch_get_profiles(user_ids, max_attempts=5):
     """
-    Génère les en-têtes CORS dynamiques basés sur l'origine de la requête.
+    Récupère plusieurs profils en un seul BatchGetItem (100 clés max), en resoumettant les
+    UnprocessedKeys avec un backoff exponentiel aléatoire.
+    Retourne un dictionnaire userId -> élément DynamoDB ; les comptes inexistants sont absents
     """
-    # Obtenez l'origine de la requête si elle existe
-    origin = None
-    if 'headers' in event and event['headers']:
-        origin = event['headers'].get('origin') or event['headers'].get('Origin')
+    items = {}
+    remaining = {
+        TABLE_NAME: {
+            'Keys': [{'userId': {'S': user_id}} for user_id in user_ids],
+            'ProjectionExpression': PROFILE_PROJECTION,
+            'ExpressionAttributeNames': PROFILE_ATTRIBUTE_NAMES
+        }
+    }
+    for attempt in range(max_attempts):
+        response = dynamodb_client.batch_get_item(RequestItems=remaining)
+        for raw_item in response.get('Responses', {}).get(TABLE_NAME, []):
+            item = deserialize_item(raw_item)
+            items[item['userId']] = item
+        
+        remaining = response.get('UnprocessedKeys')
+        if not remaining:
+            return items
+        time.sleep(random.uniform(0, 0.05 * 2 ** attempt))
+    
+    logger.warning(f"Profils non lus après {max_attempts} tentatives: {len(remaining[TABLE_NAME]['Keys'])}")
+    return items
+
+def handle_batch_get_profiles(event, cors_headers):
+    """
+    POST { "userIds": [...] } : renvoie les profils demandés (au plus MAX_BATCH_PROFILES)
+    dans l'ordre de la requête, les comptes inexistants étant omis
+    """
+    try:
+        body = json.loads(event.get('body') or '{}')
+    except json.JSONDecodeError:
+        return {
+            'statusCode': 400,
+            'headers': cors_headers,
+            'body': json.dumps({'message': 'Invalid JSON in request body'})
+        }
+    
+    user_ids = body.get('userIds') if isinstance(body, dict) else None
+    if not isinstance(user_ids, list) or not user_ids or not all(isinstance(u, str) and u for u in user_ids):
+        return {
+            'statusCode': 400,
+            'headers': cors_headers,
+            'body': json.dumps({'message': 'userIds must be a non-empty list of user IDs'})
+        }
+    
+    user_ids = list(dict.fromkeys(user_ids))
+    if len(user_ids) > MAX_BATCH_PROFILES:
+        return {
+            'statusCode': 400,
+            'headers': cors_headers,
+            'body': json.dumps({'message': f'At most {MAX_BATCH_PROFILES} userIds per request'})
+        }
     
-    # Définir l'origine autorisée
-    allowed_origin = origin if origin else 'http://localhost:3000'
+    items = batch_get_profiles(user_ids)
+    profiles = [convert_dynamodb_to_profile(items[user_id]) for user_id in user_ids if user_id in items]
     
-    # Ne jamais utiliser '*' avec credentials
     return {
-        'Access-Control-Allow-Origin': allowed_origin,
-        'Access-Control-Allow-Headers': 'Content-Type,X-Amz-Date,Authorization,X-Api-Key,X-Amz-Security-Token',
-        'Access-Control-Allow-Methods': 'GET,OPTIONS',
-        'Access-Control-Allow-Credentials': 'true'
+        'statusCode': 200,
+        'headers': cors_headers,
+        'body': to_json({'profiles': profiles, 'count': len(profiles)})
     }
 
+# En-têtes CORS communs, construits une seule fois par conteneur
+# (ne jamais utiliser '*' avec credentials)
+BASE_CORS_HEADERS = {
+    'Access-Control-Allow-Headers': 'Content-Type,X-Amz-Date,Authorization,X-Api-Key,X-Amz-Security-Token,If-None-Match',
+    'Access-Control-Allow-Methods': 'GET,POST,OPTIONS',
+    'Access-Control-Expose-Headers': 'ETag',
+    'Access-Control-Allow-Credentials': 'true'
+}
+
+def get_cors_headers(event):
+    """
+    Génère les en-têtes CORS en fonction de l'origine de la requête ; seules les origines
+    autorisées sont renvoyées, les autres reçoivent l'origine par défaut
+    """
+    headers = event.get('headers') or {}
+    origin = headers.get('origin') or headers.get('Origin')
+    allowed_origin = origin if origin in ALLOWED_ORIGINS else DEFAULT_ORIGIN
+    return {**BASE_CORS_HEADERS, 'Access-Control-Allow-Origin': allowed_origin}
+
 def lambda_handler(event, context):
     """
     Gestionnaire principal de la Lambda pour récupérer un profil utilisateur.
     """
-    logger.info(f"Événement reçu: {json.dumps(event)}")
-    cors_headers = get_cors_headers(event)
-
-    # Requête OPTIONS pour CORS
-    if event['httpMethod'] == 'OPTIONS':
+    # Requête OPTIONS pour CORS : réponse immédiate, sans corps ni journalisation
+    if event.get('httpMethod') == 'OPTIONS':
         return {
-            'statusCode': 200,
-            'headers': cors_headers,
-            'body': json.dumps('Preflight request successful')
+            'statusCode': 204,
+            'headers': get_cors_headers(event),
+            'body': ''
         }
 
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Événement reçu: httpMethod=%s resource=%s", event.get('httpMethod'), event.get('resource'))
+    cors_headers = get_cors_headers(event)
+
     try:
+        # Lecture groupée de plusieurs profils
+        if event.get('httpMethod') == 'POST':
+            return handle_batch_get_profiles(event, cors_headers)
+        
         # Extraire l'ID utilisateur du chemin ou des paramètres
         path_parameters = event.get('pathParameters', {}) or {}
         query_parameters = event.get('queryStringParameters', {}) or {}
@@ -228,7 +418,7 @@ def lambda_handler(event, context):
         if not user_id:
             try:
                 user_id = event['requestContext']['authorizer']['claims']['sub']
-                logger.info(f"Utilisation de l'ID utilisateur authentifié: {user_id}")
+                logger.info("Utilisation de l'ID utilisateur authentifié: %s", user_id)
             except KeyError:
                 return {
                     'statusCode': 400,
@@ -236,10 +426,15 @@ def lambda_handler(event, context):
                     'body': json.dumps('User ID is required')
                 }
             
-        logger.info(f"Récupération du profil pour userId: {user_id}")
+        logger.info("Récupération du profil pour userId: %s", user_id)
 
         # Récupérer l'élément dans DynamoDB
-        response = table.get_item(Key={'userId': user_id})
+        response = dynamodb_client.get_item(
+            TableName=TABLE_NAME,
+            Key={'userId': {'S': user_id}},
+            ProjectionExpression=PROFILE_PROJECTION,
+            ExpressionAttributeNames=PROFILE_ATTRIBUTE_NAMES
+        )
         
         if 'Item' not in response:
             logger.warn(f"Aucun profil trouvé pour l'utilisateur: {user_id}")
@@ -249,8 +444,23 @@ def lambda_handler(event, context):
                 'body': json.dumps('Profil utilisateur non trouvé')
             }
 
+        item = deserialize_item(response['Item'])
+        
+        # Réponse conditionnelle : si le client possède déjà cette version, renvoyer 304
+        # sans construire ni sérialiser le profil
+        image_url = resolve_profile_image_url(item)
+        etag = compute_profile_etag(item, image_url)
+        request_headers = event.get('headers') or {}
+        if_none_match = request_headers.get('if-none-match') or request_headers.get('If-None-Match')
+        if if_none_match and etag in (tag.strip() for tag in if_none_match.split(',')):
+            return {
+                'statusCode': 304,
+                'headers': {**cors_headers, 'ETag': etag},
+                'body': ''
+            }
+        
         # Convertir l'élément DynamoDB en profil structuré
-        profile = convert_dynamodb_to_profile(response['Item'])
+        profile = convert_dynamodb_to_profile(item, image_url)
         
         if not profile:
             logger.error(f"Échec de la conversion du profil pour: {user_id}")
@@ -261,13 +471,13 @@ def lambda_handler(event, context):
             }
         
         # Log du statut de disponibilité
-        logger.info(f"Statut de disponibilité récupéré: {profile.get('availabilityStatus')}")
+        logger.info("Statut de disponibilité récupéré: %s", profile.get('availabilityStatus'))
 
         # Retourner le profil
         return {
             'statusCode': 200,
-            'headers': cors_headers,
-            'body': json.dumps(profile, cls=DecimalEncoder)
+            'headers': {**cors_headers, 'ETag': etag},
+            'body': to_json(profile)
         }
 
     except Exception as e:
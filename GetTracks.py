@@ -1,10 +1,29 @@
+import base64
 import json
 import boto3
 import os
 import logging
+import hashlib
+import hmac
+import random
+import threading
+import time
+from dataclasses import dataclass
 from decimal import Decimal
+from typing import Optional
+from urllib.parse import quote
 import traceback
-from boto3.dynamodb.conditions import Key, Attr
+from boto3.dynamodb.types import TypeDeserializer
+from botocore.config import Config
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+# orjson (extension C) est utilisé pour sérialiser les réponses lorsqu'il est empaqueté
+# avec la Lambda ; sinon on se rabat sur le module json standard
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 # Configuration du logging
 logger = logging.getLogger()
@@ -16,13 +35,171 @@ LIKES_TABLE = os.environ.get('LIKES_TABLE', 'chordora-track-likes')
 USERS_TABLE = os.environ.get('USERS_TABLE', 'chordora-users')
 BUCKET_NAME = os.environ.get('BUCKET_NAME', 'chordora-users')
 AWS_REGION = os.environ.get('AWS_REGION', 'us-east-1')
+DEFAULT_ORIGIN = 'http://localhost:3000'
+# Origines CORS autorisées (liste séparée par des virgules) : ALLOWED_ORIGINS doit être défini au
+# déploiement avec les domaines du frontend ; les autres origines reçoivent DEFAULT_ORIGIN
+ALLOWED_ORIGINS = frozenset(
+    origin.strip() for origin in os.environ.get('ALLOWED_ORIGINS', DEFAULT_ORIGIN).split(',') if origin.strip()
+)
+REDIS_HOST = os.environ.get('REDIS_HOST')
+REDIS_LIKES_TTL = int(os.environ.get('REDIS_LIKES_TTL', '60'))
+
+# Attributs des pistes lus dans DynamoDB ; les noms passent par des alias
+# pour ne pas entrer en conflit avec les mots réservés de DynamoDB
+TRACK_ATTRIBUTES = [
+    'track_id', 'user_id', 'title', 'genre', 'bpm', 'duration', 'mood', 'tags', 'description',
+    'file_path', 'cover_image_path', 'isPrivate', 'likes', 'plays', 'created_at', 'updated_at'
+]
+TRACK_PROJECTION = ', '.join(f'#a{i}' for i in range(len(TRACK_ATTRIBUTES)))
+TRACK_ATTRIBUTE_NAMES = {f'#a{i}': name for i, name in enumerate(TRACK_ATTRIBUTES)}
+
+# Taille maximale d'une page de pistes (paramètre limit)
+MAX_TRACKS_PAGE_SIZE = 100
+
+# Configuration botocore partagée : pool de connexions borné et keep-alive TCP
+# pour réutiliser les connexions TLS entre invocations d'un même conteneur
+BOTO_CONFIG = Config(
+    max_pool_connections=50,
+    retries={'max_attempts': 3, 'mode': 'adaptive'},
+    tcp_keepalive=True
+)
 
 # Initialisation des clients AWS
-dynamodb = boto3.resource('dynamodb')
-tracks_table = dynamodb.Table(TRACKS_TABLE)
-likes_table = dynamodb.Table(LIKES_TABLE)
-users_table = dynamodb.Table(USERS_TABLE)
-s3 = boto3.client('s3')
+# Client DynamoDB bas niveau (thread-safe, sans la couche resource) : les éléments sont
+# désérialisés en une passe par deserialize_item
+dynamodb_client = boto3.client('dynamodb', config=BOTO_CONFIG)
+deserializer = TypeDeserializer()
+s3 = boto3.client('s3', config=BOTO_CONFIG)
+
+# Cache Redis (ElastiCache) de l'état « liké » des pistes par utilisateur, activé uniquement
+# lorsque REDIS_HOST est défini ; LikesTracks invalide la clé à chaque like / unlike
+if REDIS_HOST:
+    import redis
+    redis_client = redis.Redis(
+        host=REDIS_HOST,
+        port=int(os.environ.get('REDIS_PORT', '6379')),
+        socket_timeout=0.05,
+        socket_connect_timeout=0.05
+    )
+    # Écriture atomique des états dans le hash lk:{user_id} ; la durée de vie n'est posée qu'à
+    # la création du hash et jamais prolongée, pour qu'aucun état n'y survive plus de
+    # REDIS_LIKES_TTL secondes (équivalent de EXPIRE NX, disponible avant Redis 7)
+    set_like_states_script = redis_client.register_script("""
+for i = 2, #ARGV, 2 do
+    redis.call('HSET', KEYS[1], ARGV[i], ARGV[i + 1])
+end
+if redis.call('TTL', KEYS[1]) == -1 then
+    redis.call('EXPIRE', KEYS[1], ARGV[1])
+end
+""")
+else:
+    redis_client = None
+
+class S3UrlSigner:
+    """
+    Signature SigV4 locale des URLs GET d'un bucket S3 (signature en paramètres de requête).
+    Équivalent de s3.generate_presigned_url sans la pile de modèles et d'événements botocore :
+    la clé de signature dérivée est mise en cache par jour et par clé d'accès
+    """
+    def __init__(self, credentials, bucket, region):
+        self.credentials = credentials
+        self.region = region
+        self.host = f"{bucket}.s3.{region}.amazonaws.com"
+        self._signing_keys = {}
+
+    def _signing_key(self, secret_key, access_key, datestamp):
+        cache_key = (access_key, datestamp)
+        signing_key = self._signing_keys.get(cache_key)
+        if signing_key is None:
+            signing_key = f"AWS4{secret_key}".encode()
+            for part in (datestamp, self.region, 's3', 'aws4_request'):
+                signing_key = hmac.new(signing_key, part.encode(), hashlib.sha256).digest()
+            # Une seule clé utile à la fois (changement de jour ou rotation des identifiants)
+            self._signing_keys = {cache_key: signing_key}
+        return signing_key
+
+    def presign(self, object_key, expires_in=3600, params=None, now=None):
+        """
+        Renvoie l'URL présignée GET de object_key ; params ajoute des paramètres signés
+        (ex. response-content-type)
+        """
+        # Identifiants figés à chaque appel : suit le renouvellement des identifiants temporaires
+        credentials = self.credentials.get_frozen_credentials()
+        amz_date = time.strftime('%Y%m%dT%H%M%SZ', time.gmtime(now))
+        datestamp = amz_date[:8]
+        scope = f"{datestamp}/{self.region}/s3/aws4_request"
+        
+        query = {
+            'X-Amz-Algorithm': 'AWS4-HMAC-SHA256',
+            'X-Amz-Credential': f"{credentials.access_key}/{scope}",
+            'X-Amz-Date': amz_date,
+            'X-Amz-Expires': str(expires_in),
+            'X-Amz-SignedHeaders': 'host'
+        }
+        if credentials.token:
+            query['X-Amz-Security-Token'] = credentials.token
+        if params:
+            query.update(params)
+        
+        canonical_uri = '/' + quote(object_key, safe='/~')
+        canonical_query = '&'.join(
+            f"{quote(name, safe='-_.~')}={quote(value, safe='-_.~')}" for name, value in sorted(query.items())
+        )
+        canonical_request = f"GET\n{canonical_uri}\n{canonical_query}\nhost:{self.host}\n\nhost\nUNSIGNED-PAYLOAD"
+        string_to_sign = (
+            f"AWS4-HMAC-SHA256\n{amz_date}\n{scope}\n"
+            f"{hashlib.sha256(canonical_request.encode()).hexdigest()}"
+        )
+        signature = hmac.new(
+            self._signing_key(credentials.secret_key, credentials.access_key, datestamp),
+            string_to_sign.encode(),
+            hashlib.sha256
+        ).hexdigest()
+        return f"https://{self.host}{canonical_uri}?{canonical_query}&X-Amz-Signature={signature}"
+
+# Pool de threads réutilisé entre les invocations pour le traitement des pistes
+EXECUTOR = ThreadPoolExecutor(max_workers=8)
+
+# Signataire local des URLs présignées (audio et couvertures)
+signer = S3UrlSigner(boto3.Session().get_credentials(), BUCKET_NAME, AWS_REGION)
+
+# Cache LRU des URLs présignées partagé entre les invocations d'un même conteneur.
+# Les URLs sont valides 24 h ; une URL n'est resservie que pendant 55 minutes pour que
+# le client dispose toujours de plus de 23 h de validité
+PRESIGNED_URL_EXPIRES_IN = 86400
+PRESIGNED_URL_CACHE_TTL = 3300
+PRESIGNED_URL_CACHE_SIZE = 10000
+presigned_url_cache = OrderedDict()
+presigned_url_cache_lock = threading.Lock()
+
+def presign(s3_key, content_type):
+    """
+    Renvoie l'URL présignée (lecture en ligne, type MIME forcé) pour la clé S3,
+    depuis le cache tant qu'elle reste valide
+    """
+    cache_key = (s3_key, content_type)
+    now = time.time()
+    with presigned_url_cache_lock:
+        cached = presigned_url_cache.get(cache_key)
+        if cached and cached[1] > now:
+            presigned_url_cache.move_to_end(cache_key)
+            return cached[0]
+    
+    url = signer.presign(
+        s3_key,
+        PRESIGNED_URL_EXPIRES_IN,
+        {
+            'response-content-type': content_type,
+            'response-content-disposition': 'inline'
+        },
+        now=now
+    )
+    with presigned_url_cache_lock:
+        presigned_url_cache[cache_key] = (url, now + PRESIGNED_URL_CACHE_TTL)
+        presigned_url_cache.move_to_end(cache_key)
+        while len(presigned_url_cache) > PRESIGNED_URL_CACHE_SIZE:
+            presigned_url_cache.popitem(last=False)
+    return url
 
 class DecimalEncoder(json.JSONEncoder):
     def default(self, obj):
@@ -30,13 +207,26 @@ class DecimalEncoder(json.JSONEncoder):
             return float(obj)
         return super(DecimalEncoder, self).default(obj)
 
+def decimal_default(obj):
+    """Conversion des décimaux pour orjson"""
+    if isinstance(obj, Decimal):
+        return float(obj)
+    raise TypeError(f"Type {type(obj).__name__} non sérialisable en JSON")
+
+def to_json(payload):
+    """Sérialise le corps d'une réponse en JSON"""
+    if orjson is not None:
+        return orjson.dumps(payload, default=decimal_default).decode()
+    return json.dumps(payload, cls=DecimalEncoder)
+
 def get_cors_headers(event):
-    """Renvoie les en-têtes CORS adaptés à l'origine de la requête"""
-    origin = None
-    if 'headers' in event and event['headers']:
-        origin = event['headers'].get('origin') or event['headers'].get('Origin')
-    
-    allowed_origin = origin if origin else 'https://app.chordora.com'
+    """
+    Renvoie les en-têtes CORS en fonction de l'origine de la requête ; seules les origines
+    autorisées sont renvoyées, les autres reçoivent l'origine par défaut
+    """
+    headers = event.get('headers') or {}
+    origin = headers.get('origin') or headers.get('Origin')
+    allowed_origin = origin if origin in ALLOWED_ORIGINS else DEFAULT_ORIGIN
     
     return {
         'Access-Control-Allow-Origin': allowed_origin,
@@ -45,28 +235,144 @@ def get_cors_headers(event):
         'Access-Control-Allow-Credentials': 'true'
     }
 
-def get_user_profile(user_id):
-    """Récupère le profil utilisateur depuis DynamoDB"""
+def deserialize_item(item):
+    """Convertit un élément au format AttributeValue en dictionnaire Python"""
+    return {key: deserializer.deserialize(value) for key, value in item.items()}
+
+def batch_get_all(request_items, max_attempts=5):
+    """
+    Exécute un BatchGetItem en resoumettant les UnprocessedKeys (throttling, réponse
+    partielle) avec un backoff exponentiel aléatoire.
+    Retourne un dictionnaire table -> éléments lus (désérialisés)
+    """
+    items = {}
+    remaining = request_items
+    for attempt in range(max_attempts):
+        response = dynamodb_client.batch_get_item(RequestItems=remaining)
+        for table_name, table_items in response.get('Responses', {}).items():
+            items.setdefault(table_name, []).extend(deserialize_item(item) for item in table_items)
+        
+        remaining = response.get('UnprocessedKeys')
+        if not remaining:
+            return items
+        time.sleep(random.uniform(0, 0.05 * 2 ** attempt))
+    
+    logger.warning(f"Clés non traitées après {max_attempts} tentatives: {sum(len(r['Keys']) for r in remaining.values())}")
+    return items
+
+def fetch_tracks_chunk(chunk_ids):
+    """Lit un lot d'au plus 100 pistes (IDs distincts) en un BatchGetItem"""
+    return batch_get_all({
+        TRACKS_TABLE: {
+            'Keys': [{'track_id': {'S': id}} for id in chunk_ids],
+            'ProjectionExpression': TRACK_PROJECTION,
+            'ExpressionAttributeNames': TRACK_ATTRIBUTE_NAMES
+        }
+    }).get(TRACKS_TABLE, [])
+
+def fetch_tracks(track_ids):
+    """
+    Récupère les pistes dont les IDs sont donnés (doublons ignorés).
+    Retourne la liste des pistes trouvées
+    """
+    unique_ids = list(dict.fromkeys(track_ids))
+    
+    # BatchGetItem est limité à 100 éléments : les chunks sont lus en parallèle
+    chunk_size = 100
+    chunks = [unique_ids[i:i + chunk_size] for i in range(0, len(unique_ids), chunk_size)]
+    return [track for tracks_batch in EXECUTOR.map(fetch_tracks_chunk, chunks) for track in tracks_batch]
+
+def get_artist_names(user_ids):
+    """
+    Récupère en lecture groupée (100 clés par BatchGetItem) les noms d'utilisateur des artistes.
+    Retourne un dictionnaire userId -> username ; les profils absents ou sans nom sont omis
+    """
+    user_ids = list(user_ids)
+    artist_names = {}
     try:
-        response = users_table.get_item(Key={'userId': user_id})
-        if 'Item' in response:
-            return response['Item']
-        return None
+        for i in range(0, len(user_ids), 100):
+            items = batch_get_all({
+                USERS_TABLE: {
+                    'Keys': [{'userId': {'S': user_id}} for user_id in user_ids[i:i + 100]],
+                    'ProjectionExpression': 'userId, username'
+                }
+            })
+            for item in items.get(USERS_TABLE, []):
+                if 'username' in item:
+                    artist_names[item['userId']] = item['username']
     except Exception as e:
-        logger.error(f"Erreur lors de la récupération du profil utilisateur {user_id}: {str(e)}")
-        return None
+        logger.error(f"Erreur lors de la récupération des profils des artistes: {str(e)}")
+    return artist_names
+
+def get_cached_like_states(user_id, track_ids):
+    """
+    Lit dans Redis l'état « liké » connu des pistes données pour l'utilisateur.
+    Retourne un dict track_id -> bool limité aux pistes présentes en cache
+    """
+    if redis_client is None or not track_ids:
+        return {}
+    try:
+        values = redis_client.hmget(f"lk:{user_id}", track_ids)
+    except redis.RedisError as e:
+        logger.warning(f"Cache Redis indisponible: {str(e)}")
+        return {}
+    return {track_id: value == b'1' for track_id, value in zip(track_ids, values) if value is not None}
+
+def set_cached_like_states(user_id, states):
+    """
+    Enregistre dans Redis l'état « liké » des pistes ; le hash expire REDIS_LIKES_TTL secondes
+    après sa création, sans que les écritures suivantes ne repoussent l'expiration
+    """
+    if redis_client is None or not states:
+        return
+    args = [REDIS_LIKES_TTL]
+    for track_id, liked in states.items():
+        args.extend((track_id, '1' if liked else '0'))
+    try:
+        set_like_states_script(keys=[f"lk:{user_id}"], args=args)
+    except redis.RedisError as e:
+        logger.warning(f"Impossible d'alimenter le cache Redis: {str(e)}")
 
-def get_audio_duration(bucket, key):
+def get_liked_track_ids(user_id, track_ids):
     """
-    Tente d'extraire la durée d'un fichier audio en utilisant les métadonnées S3.
+    Détermine lesquelles des pistes données ont été likées par l'utilisateur : d'abord
+    depuis le cache Redis, puis en BatchGetItem de 100 clés pour les pistes absentes du cache.
+    Retourne l'ensemble des track_id likés (vide en cas d'erreur)
+    """
+    unique_track_ids = list(dict.fromkeys(track_ids))
+    cached_states = get_cached_like_states(user_id, unique_track_ids)
+    liked_track_ids = {track_id for track_id, liked in cached_states.items() if liked}
+
+    prefix = f"{user_id}#"
+    like_ids = [prefix + track_id for track_id in unique_track_ids if track_id not in cached_states]
+    fetched_liked_ids = set()
+    try:
+        for i in range(0, len(like_ids), 100):
+            items = batch_get_all({
+                LIKES_TABLE: {
+                    'Keys': [{'like_id': {'S': like_id}} for like_id in like_ids[i:i + 100]],
+                    'ProjectionExpression': 'like_id'
+                }
+            })
+            for item in items.get(LIKES_TABLE, []):
+                fetched_liked_ids.add(item['like_id'][len(prefix):])
+    except Exception as e:
+        logger.error(f"Erreur lors de la vérification des likes: {str(e)}")
+        return liked_track_ids
+
+    set_cached_like_states(user_id, {
+        like_id[len(prefix):]: like_id[len(prefix):] in fetched_liked_ids for like_id in like_ids
+    })
+    return liked_track_ids | fetched_liked_ids
+
+def get_audio_duration(key, response):
+    """
+    Tente d'extraire la durée d'un fichier audio à partir de la réponse HEAD S3 déjà obtenue.
     Si ce n'est pas possible, renvoie une durée par défaut.
     """
     default_duration = 180  # 3 minutes par défaut
     
     try:
-        # Récupérer les métadonnées du fichier
-        response = s3.head_object(Bucket=bucket, Key=key)
-        
         # Vérifier si les métadonnées personnalisées contiennent la durée
         if 'Metadata' in response and 'duration' in response['Metadata']:
             try:
@@ -82,212 +388,205 @@ def get_audio_duration(bucket, key):
             # Estimation très approximative
             estimated_duration = file_size_mb * 60
             if estimated_duration > 0:
-                logger.info(f"Durée estimée par la taille pour {key}: {estimated_duration}s")
+                logger.info("Durée estimée par la taille pour %s: %ss", key, estimated_duration)
                 return min(estimated_duration, 1800)  # Limiter à 30 minutes max
         
         # Si aucune durée n'est trouvée ou estimée, utiliser une valeur par défaut
-        logger.info(f"Utilisation de la durée par défaut pour {key}: {default_duration}s")
+        logger.info("Utilisation de la durée par défaut pour %s: %ss", key, default_duration)
         return default_duration
     except Exception as e:
         logger.warning(f"Impossible de déterminer la durée du fichier audio {key}: {str(e)}")
         return default_duration
 
-def generate_presigned_urls(tracks, auth_user_id=None):
+def process_track(track, artist_names):
     """
-    Génère des URLs présignées pour les pistes audio et les images de couverture
-    Ajoute également les informations d'artiste et vérifie si l'utilisateur authentifié a liké chaque piste
+    Prépare une piste pour la réponse : URLs présignées (audio et couverture), métadonnées S3
+    et artiste. La piste, désérialisée pour cette seule requête, est enrichie sur place.
+    Renvoie None si la piste est inexploitable
     """
-    tracks_with_urls = []
-    
-    for track in tracks:
-        try:
-            track_with_url = dict(track)  # Créer une copie pour éviter de modifier l'original
-            
-            # Récupérer les informations de l'artiste
-            if 'user_id' in track:
-                user_profile = get_user_profile(track['user_id'])
-                if user_profile and 'username' in user_profile:
-                    track_with_url['artist'] = user_profile['username']
-                else:
-                    track_with_url['artist'] = "Artiste"
-            else:
-                track_with_url['artist'] = "Artiste"
-            
-            # Générer URL présignée pour le fichier audio
-            if 'file_path' in track:
+    try:
+        # Informations de l'artiste
+        track['artist'] = artist_names.get(track.get('user_id'), "Artiste")
+        
+        # Générer URL présignée pour le fichier audio
+        if 'file_path' in track:
+            try:
+                # Vérifier si l'objet existe dans S3
                 try:
-                    # Vérifier si l'objet existe dans S3
-                    try:
-                        s3.head_object(Bucket=BUCKET_NAME, Key=track['file_path'])
-                        
-                        # Extraire la durée du fichier audio
-                        if 'duration' not in track or not track['duration']:
-                            track_with_url['duration'] = get_audio_duration(BUCKET_NAME, track['file_path'])
+                    # Un seul HEAD : existence, durée estimée et métadonnées du fichier
+                    head_response = s3.head_object(Bucket=BUCKET_NAME, Key=track['file_path'])
+                    
+                    # Extraire la durée du fichier audio
+                    if 'duration' not in track or not track['duration']:
+                        track['duration'] = get_audio_duration(track['file_path'], head_response)
+                    
+                    # Générer l'URL présignée avec une durée de validité plus longue et des paramètres améliorés
+                    # URL valide 24 heures, type MIME forcé et lecture en ligne
+                    presigned_url = presign(track['file_path'], 'audio/mpeg')
+                    
+                    # Vérifier que l'URL n'est pas vide
+                    if not presigned_url:
+                        logger.error(f"URL présignée générée vide pour la piste {track.get('track_id')}")
+                        raise Exception("URL présignée vide générée")
                         
-                        # Générer l'URL présignée avec une durée de validité plus longue et des paramètres améliorés
-                        presigned_url = s3.generate_presigned_url(
-                            'get_object',
-                            Params={
-                                'Bucket': BUCKET_NAME, 
-                                'Key': track['file_path'],
-                                'ResponseContentType': 'audio/mpeg',  # Forcer le type MIME correct
-                                'ResponseContentDisposition': 'inline'  # Encourage la lecture en ligne
-                            },
-                            ExpiresIn=86400  # URL valide 24 heures au lieu de 3600s
-                        )
+                    logger.info("URL présignée générée pour la piste %s: %s...", track.get('track_id'), presigned_url[:50])
+                    track['presigned_url'] = presigned_url
+                    
+                    # Ajouter le format et la taille comme métadonnées
+                    if 'ContentLength' in head_response:
+                        track['file_size'] = head_response['ContentLength']
+                    if 'ContentType' in head_response:
+                        track['file_type'] = head_response['ContentType']
                         
-                        # Vérifier que l'URL n'est pas vide
-                        if not presigned_url:
-                            logger.error(f"URL présignée générée vide pour la piste {track.get('track_id')}")
-                            raise Exception("URL présignée vide générée")
-                            
-                        logger.info(f"URL présignée générée pour la piste {track.get('track_id')}: {presigned_url[:50]}...")
-                        track_with_url['presigned_url'] = presigned_url
-                        
-                        # Ajouter le format et la taille comme métadonnées
-                        try:
-                            response = s3.head_object(Bucket=BUCKET_NAME, Key=track['file_path'])
-                            if 'ContentLength' in response:
-                                track_with_url['file_size'] = response['ContentLength']
-                            if 'ContentType' in response:
-                                track_with_url['file_type'] = response['ContentType']
-                        except Exception as meta_error:
-                            logger.warning(f"Impossible de récupérer les métadonnées du fichier: {str(meta_error)}")
-                            
-                    except s3.exceptions.ClientError as e:
-                        # Si le fichier n'existe pas, on le journalise clairement
-                        if e.response['Error']['Code'] == '404':
-                            logger.error(f"Le fichier audio n'existe pas dans S3: {track['file_path']}")
-                            track_with_url['error'] = "Le fichier audio n'existe pas"
-                            track_with_url['file_missing'] = True
-                        else:
-                            logger.error(f"Erreur S3 lors de la vérification du fichier {track['file_path']}: {str(e)}")
-                            track_with_url['error'] = f"Erreur S3: {e.response['Error']['Code']}"
-                except Exception as e:
-                    logger.error(f"Erreur lors de la génération de l'URL audio pour {track.get('track_id')}: {str(e)}")
-                    logger.error(traceback.format_exc())
-                    track_with_url['error'] = 'Could not generate audio URL'
-            
-            # Générer URL présignée pour l'image de couverture si elle existe
-            if 'cover_image_path' in track and track['cover_image_path']:
-                try:
-                    # Vérifier si le fichier existe avant de générer l'URL
-                    try:
-                        s3.head_object(Bucket=BUCKET_NAME, Key=track['cover_image_path'])
-                        
-                        cover_url = s3.generate_presigned_url(
-                            'get_object',
-                            Params={
-                                'Bucket': BUCKET_NAME, 
-                                'Key': track['cover_image_path'],
-                                'ResponseContentType': 'image/jpeg',  # Forcer le type MIME
-                                'ResponseContentDisposition': 'inline'  # Pour affichage direct
-                            },
-                            ExpiresIn=86400  # URL valide 24 heures
-                        )
-                        track_with_url['cover_image'] = cover_url
-                        logger.info(f"URL de couverture générée pour la piste {track.get('track_id')}")
-                    except s3.exceptions.ClientError as e:
-                        if e.response['Error']['Code'] == '404':
-                            logger.error(f"L'image de couverture n'existe pas dans S3: {track['cover_image_path']}")
-                            # Utiliser une image par défaut
-                            track_with_url['cover_image'] = f"https://{BUCKET_NAME}.s3.{AWS_REGION}.amazonaws.com/public/default-cover.jpg"
-                        else:
-                            logger.error(f"Erreur S3 lors de la vérification de l'image {track['cover_image_path']}: {str(e)}")
-                except Exception as e:
-                    logger.error(f"Erreur lors de la génération de l'URL de couverture pour {track.get('track_id')}: {str(e)}")
-                    logger.error(traceback.format_exc())
-            else:
-                # Si pas d'image de couverture, utiliser une image par défaut
-                track_with_url['cover_image'] = f"https://{BUCKET_NAME}.s3.{AWS_REGION}.amazonaws.com/public/default-cover.jpg"
-            
-            # Vérifier si l'utilisateur authentifié a liké cette piste
-            if auth_user_id:
+                except s3.exceptions.ClientError as e:
+                    # Si le fichier n'existe pas, on le journalise clairement
+                    if e.response['Error']['Code'] == '404':
+                        logger.error(f"Le fichier audio n'existe pas dans S3: {track['file_path']}")
+                        track['error'] = "Le fichier audio n'existe pas"
+                        track['file_missing'] = True
+                    else:
+                        logger.error(f"Erreur S3 lors de la vérification du fichier {track['file_path']}: {str(e)}")
+                        track['error'] = f"Erreur S3: {e.response['Error']['Code']}"
+            except Exception as e:
+                logger.error(f"Erreur lors de la génération de l'URL audio pour {track.get('track_id')}: {str(e)}")
+                logger.error(traceback.format_exc())
+                track['error'] = 'Could not generate audio URL'
+        
+        # Générer URL présignée pour l'image de couverture si elle existe
+        if 'cover_image_path' in track and track['cover_image_path']:
+            try:
+                # Vérifier si le fichier existe avant de générer l'URL
                 try:
-                    like_id = f"{auth_user_id}#{track['track_id']}"
-                    like_response = likes_table.get_item(Key={'like_id': like_id})
-                    track_with_url['isLiked'] = 'Item' in like_response
-                except Exception as e:
-                    logger.error(f"Erreur lors de la vérification du like: {str(e)}")
-                    track_with_url['isLiked'] = False
-            
-            tracks_with_urls.append(track_with_url)
-        except Exception as track_error:
-            logger.error(f"Erreur lors du traitement de la piste: {str(track_error)}")
-            logger.error(traceback.format_exc())
-            # Ajouter quand même la piste avec une erreur
-            if 'track_id' in track:
-                tracks_with_urls.append({
-                    'track_id': track['track_id'],
-                    'title': track.get('title', 'Piste inconnue'),
-                    'error': f"Erreur de traitement: {str(track_error)}",
-                    'user_id': track.get('user_id', '')
-                })
+                    s3.head_object(Bucket=BUCKET_NAME, Key=track['cover_image_path'])
+                    
+                    # URL valide 24 heures, pour affichage direct
+                    cover_url = presign(track['cover_image_path'], 'image/jpeg')
+                    track['cover_image'] = cover_url
+                    logger.info("URL de couverture générée pour la piste %s", track.get('track_id'))
+                except s3.exceptions.ClientError as e:
+                    if e.response['Error']['Code'] == '404':
+                        logger.error(f"L'image de couverture n'existe pas dans S3: {track['cover_image_path']}")
+                        # Utiliser une image par défaut
+                        track['cover_image'] = f"https://{BUCKET_NAME}.s3.{AWS_REGION}.amazonaws.com/public/default-cover.jpg"
+                    else:
+                        logger.error(f"Erreur S3 lors de la vérification de l'image {track['cover_image_path']}: {str(e)}")
+            except Exception as e:
+                logger.error(f"Erreur lors de la génération de l'URL de couverture pour {track.get('track_id')}: {str(e)}")
+                logger.error(traceback.format_exc())
+        else:
+            # Si pas d'image de couverture, utiliser une image par défaut
+            track['cover_image'] = f"https://{BUCKET_NAME}.s3.{AWS_REGION}.amazonaws.com/public/default-cover.jpg"
+        
+        return track
+    except Exception as track_error:
+        logger.error(f"Erreur lors du traitement de la piste: {str(track_error)}")
+        logger.error(traceback.format_exc())
+        # Ajouter quand même la piste avec une erreur
+        if 'track_id' in track:
+            return {
+                'track_id': track['track_id'],
+                'title': track.get('title', 'Piste inconnue'),
+                'error': f"Erreur de traitement: {str(track_error)}",
+                'user_id': track.get('user_id', '')
+            }
+        return None
+
+def generate_presigned_urls(tracks, auth_user_id=None):
+    """
+    Génère des URLs présignées pour les pistes audio et les images de couverture
+    Ajoute également les informations d'artiste et vérifie si l'utilisateur authentifié a liké chaque piste
+    """
+    # Noms des artistes lus en une fois plutôt qu'un get_item par piste
+    artist_names = get_artist_names({track['user_id'] for track in tracks if 'user_id' in track})
+    
+    # Les pistes sont traitées en parallèle (appels HEAD S3 et signature), dans l'ordre ;
+    # seul le client S3, thread-safe, est utilisé par les threads
+    processed = EXECUTOR.map(lambda track: process_track(track, artist_names), tracks)
+    tracks_with_urls = [track_with_url for track_with_url in processed if track_with_url is not None]
+    
+    # Vérifier si l'utilisateur authentifié a liké chaque piste (lecture groupée des likes)
+    if auth_user_id:
+        liked_track_ids = get_liked_track_ids(auth_user_id, [track['track_id'] for track in tracks_with_urls])
+        for track_with_url in tracks_with_urls:
+            track_with_url['isLiked'] = track_with_url['track_id'] in liked_track_ids
     
     return tracks_with_urls
 
+@dataclass(slots=True)
+class RequestContext:
+    """Informations extraites une seule fois de l'événement API Gateway"""
+    auth_user_id: Optional[str]
+    query_params: dict
+    path_params: dict
+    cors_headers: dict
+
+def build_request_context(event):
+    """Construit le contexte de la requête en un seul passage sur l'événement"""
+    claims = ((event.get('requestContext') or {}).get('authorizer') or {}).get('claims') or {}
+    return RequestContext(
+        auth_user_id=claims.get('sub'),
+        query_params=event.get('queryStringParameters') or {},
+        path_params=event.get('pathParameters') or {},
+        cors_headers=get_cors_headers(event)
+    )
+
 def lambda_handler(event, context):
-    logger.info(f"Événement reçu: {json.dumps(event)}")
-    cors_headers = get_cors_headers(event)
-    
-    # Gestion des requêtes OPTIONS (pre-flight CORS)
+    # Requête OPTIONS pour CORS (pre-flight) : réponse immédiate, sans corps ni journalisation
     if event.get('httpMethod') == 'OPTIONS':
         return {
-            'statusCode': 200,
-            'headers': cors_headers,
-            'body': json.dumps('Preflight request successful')
+            'statusCode': 204,
+            'headers': get_cors_headers(event),
+            'body': ''
         }
     
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Événement reçu: httpMethod=%s resource=%s", event.get('httpMethod'), event.get('resource'))
+    ctx = build_request_context(event)
+    cors_headers = ctx.cors_headers
+    
     try:
-        # Extraction de l'ID utilisateur authentifié
-        auth_user_id = None
-        if 'requestContext' in event and 'authorizer' in event['requestContext'] and 'claims' in event['requestContext']['authorizer']:
-            auth_user_id = event['requestContext']['authorizer']['claims']['sub']
-            logger.info(f"Utilisateur authentifié: {auth_user_id}")
-        
-        # Récupérer les paramètres de requête
-        query_params = event.get('queryStringParameters', {}) or {}
-        path_params = event.get('pathParameters', {}) or {}
+        if ctx.auth_user_id:
+            logger.info("Utilisateur authentifié: %s", ctx.auth_user_id)
         
         # CAS 1: Piste spécifique par ID (détail d'une piste)
-        if 'trackId' in path_params:
-            track_id = path_params['trackId']
-            logger.info(f"Récupération de la piste spécifique par ID: {track_id}")
-            return get_track_by_id(track_id, auth_user_id, cors_headers)
+        if 'trackId' in ctx.path_params:
+            track_id = ctx.path_params['trackId']
+            logger.info("Récupération de la piste spécifique par ID: %s", track_id)
+            return get_track_by_id(track_id, ctx.auth_user_id, cors_headers)
         
         # CAS 2: Pistes likées par l'utilisateur (page favoris)
-        if 'likedBy' in query_params:
-            liked_by = query_params['likedBy']
+        if 'likedBy' in ctx.query_params:
+            liked_by = ctx.query_params['likedBy']
             
             # Si 'current' est passé, utiliser l'ID de l'utilisateur authentifié
             if liked_by == 'current':
-                if not auth_user_id:
+                if not ctx.auth_user_id:
                     return {
                         'statusCode': 401,
                         'headers': cors_headers,
                         'body': json.dumps({'message': 'Authentication required to view your liked tracks'})
                     }
-                liked_by = auth_user_id
+                liked_by = ctx.auth_user_id
                 
-            logger.info(f"Récupération des pistes likées par: {liked_by}")
-            return get_liked_tracks(liked_by, auth_user_id, cors_headers)
+            logger.info("Récupération des pistes likées par: %s", liked_by)
+            return get_liked_tracks(liked_by, ctx.auth_user_id, cors_headers)
         
         # CAS 3: Pistes d'un utilisateur spécifique (page profil)
-        if 'userId' in query_params:
-            target_user_id = query_params['userId']
-            logger.info(f"Récupération des pistes de l'utilisateur: {target_user_id}")
-            return get_user_tracks(target_user_id, auth_user_id, query_params, cors_headers)
+        if 'userId' in ctx.query_params:
+            target_user_id = ctx.query_params['userId']
+            logger.info("Récupération des pistes de l'utilisateur: %s", target_user_id)
+            return get_user_tracks(target_user_id, ctx.auth_user_id, ctx.query_params, cors_headers)
         
         # CAS 4: Multiple pistes par leurs IDs
-        if 'ids' in query_params and query_params['ids']:
-            track_ids = query_params['ids'].split(',')
-            logger.info(f"Récupération de plusieurs pistes par IDs: {track_ids}")
-            return get_tracks_by_ids(track_ids, auth_user_id, cors_headers)
+        if 'ids' in ctx.query_params and ctx.query_params['ids']:
+            track_ids = ctx.query_params['ids'].split(',')
+            logger.info("Récupération de plusieurs pistes par IDs: %s", track_ids)
+            return get_tracks_by_ids(track_ids, ctx.auth_user_id, cors_headers)
         
         # CAS 5: Si aucun paramètre spécifique n'est fourni, utiliser l'ID authentifié comme userId (ma page profil)
-        if auth_user_id:
-            logger.info(f"Récupération des pistes de l'utilisateur authentifié: {auth_user_id}")
-            return get_user_tracks(auth_user_id, auth_user_id, query_params, cors_headers)
+        if ctx.auth_user_id:
+            logger.info("Récupération des pistes de l'utilisateur authentifié: %s", ctx.auth_user_id)
+            return get_user_tracks(ctx.auth_user_id, ctx.auth_user_id, ctx.query_params, cors_headers)
         
         # Si aucun des cas ci-dessus n'est applicable, renvoyer une erreur
         return {
@@ -302,14 +601,19 @@ def lambda_handler(event, context):
         return {
             'statusCode': 500,
             'headers': cors_headers,
-            'body': json.dumps({'message': f'Internal server error: {str(e)}'}, cls=DecimalEncoder)
+            'body': to_json({'message': f'Internal server error: {str(e)}'})
         }
 
 def get_track_by_id(track_id, auth_user_id, cors_headers):
     """Récupère une piste spécifique par son ID"""
     try:
         # Récupérer la piste
-        response = tracks_table.get_item(Key={'track_id': track_id})
+        response = dynamodb_client.get_item(
+            TableName=TRACKS_TABLE,
+            Key={'track_id': {'S': track_id}},
+            ProjectionExpression=TRACK_PROJECTION,
+            ExpressionAttributeNames=TRACK_ATTRIBUTE_NAMES
+        )
         
         if 'Item' not in response:
             return {
@@ -318,7 +622,7 @@ def get_track_by_id(track_id, auth_user_id, cors_headers):
                 'body': json.dumps({'message': 'Track not found'})
             }
         
-        track = response['Item']
+        track = deserialize_item(response['Item'])
         
         # Vérifier si la piste est privée et n'appartient pas à l'utilisateur authentifié
         if track.get('isPrivate', False) and track.get('user_id') != auth_user_id:
@@ -341,12 +645,12 @@ def get_track_by_id(track_id, auth_user_id, cors_headers):
             }
         
         # Journaliser l'URL générée pour debug
-        logger.info(f"URL fournie pour le frontend: {track_with_url.get('presigned_url', '')[:50]}...")
+        logger.info("URL fournie pour le frontend: %s...", track_with_url.get('presigned_url', '')[:50])
         
         return {
             'statusCode': 200,
             'headers': cors_headers,
-            'body': json.dumps(track_with_url, cls=DecimalEncoder)
+            'body': to_json(track_with_url)
         }
     
     except Exception as e:
@@ -361,44 +665,35 @@ def get_track_by_id(track_id, auth_user_id, cors_headers):
 def get_liked_tracks(user_id, auth_user_id, cors_headers):
     """Récupère toutes les pistes likées par un utilisateur"""
     try:
-        # Récupérer les likes de l'utilisateur
-        likes_response = likes_table.query(
-            IndexName='user_id-index',  # Assurez-vous que cet index existe sur la table des likes
-            KeyConditionExpression=Key('user_id').eq(user_id)
-        )
-        likes = likes_response.get('Items', [])
-        
-        if not likes:
+        # Parcourir les likes de l'utilisateur page par page ; les pistes de chaque page sont
+        # lues en arrière-plan (chunks de 100) pendant que la page suivante est demandée
+        query_kwargs = {
+            'TableName': LIKES_TABLE,
+            'IndexName': 'user_id-index',  # Assurez-vous que cet index existe sur la table des likes
+            'KeyConditionExpression': '#user_id = :user_id',
+            'ExpressionAttributeNames': {'#user_id': 'user_id'},
+            'ExpressionAttributeValues': {':user_id': {'S': user_id}},
+            'ProjectionExpression': 'track_id'
+        }
+        track_futures = []
+        while True:
+            likes_response = dynamodb_client.query(**query_kwargs)
+            page_track_ids = [like['track_id']['S'] for like in likes_response.get('Items', [])]
+            for i in range(0, len(page_track_ids), 100):
+                track_futures.append(EXECUTOR.submit(fetch_tracks_chunk, page_track_ids[i:i + 100]))
+            if 'LastEvaluatedKey' not in likes_response:
+                break
+            query_kwargs['ExclusiveStartKey'] = likes_response['LastEvaluatedKey']
+        
+        if not track_futures:
             # Pas de pistes likées trouvées
             return {
                 'statusCode': 200,
                 'headers': cors_headers,
-                'body': json.dumps({'tracks': [], 'count': 0}, cls=DecimalEncoder)
+                'body': to_json({'tracks': [], 'count': 0})
             }
         
-        # Récupérer les IDs des pistes likées
-        track_ids = [like['track_id'] for like in likes]
-        
-        # Récupérer les pistes en batch
-        tracks = []
-        
-        # BatchGetItem est limité à 100 éléments, donc on divise en chunks si nécessaire
-        chunk_size = 100
-        for i in range(0, len(track_ids), chunk_size):
-            chunk = track_ids[i:i + chunk_size]
-            keys = [{'track_id': id} for id in chunk]
-            
-            response = dynamodb.batch_get_item(
-                RequestItems={
-                    TRACKS_TABLE: {
-                        'Keys': keys
-                    }
-                }
-            )
-            
-            if TRACKS_TABLE in response.get('Responses', {}):
-                batch_tracks = response['Responses'][TRACKS_TABLE]
-                tracks.extend(batch_tracks)
+        tracks = [track for future in track_futures for track in future.result()]
         
         # Filtrer les pistes privées si l'utilisateur n'est pas le propriétaire
         if user_id != auth_user_id:
@@ -420,7 +715,7 @@ def get_liked_tracks(user_id, auth_user_id, cors_headers):
         return {
             'statusCode': 200,
             'headers': cors_headers,
-            'body': json.dumps({'tracks': valid_tracks, 'count': len(valid_tracks)}, cls=DecimalEncoder)
+            'body': to_json({'tracks': valid_tracks, 'count': len(valid_tracks)})
         }
     
     except Exception as e:
@@ -446,20 +741,7 @@ def get_tracks_by_ids(track_ids, auth_user_id, cors_headers):
         track_ids = track_ids[:100]
         
         # Récupérer les pistes par batch
-        tracks = []
-        keys = [{'track_id': id} for id in track_ids]
-        
-        # BatchGetItem est limité à 100 éléments
-        response = dynamodb.batch_get_item(
-            RequestItems={
-                TRACKS_TABLE: {
-                    'Keys': keys
-                }
-            }
-        )
-        
-        if TRACKS_TABLE in response.get('Responses', {}):
-            tracks = response['Responses'][TRACKS_TABLE]
+        tracks = fetch_tracks(track_ids)
         
         # Filtrer les pistes privées si l'utilisateur n'est pas le propriétaire
         if auth_user_id:
@@ -474,18 +756,14 @@ def get_tracks_by_ids(track_ids, auth_user_id, cors_headers):
         # Filtrer les pistes avec des fichiers manquants
         valid_tracks = [track for track in tracks_with_urls if not track.get('file_missing')]
         
-        # Préserver l'ordre des pistes tel que demandé dans track_ids
-        ordered_tracks = []
-        for tid in track_ids:
-            for track in valid_tracks:
-                if track['track_id'] == tid:
-                    ordered_tracks.append(track)
-                    break
+        # Préserver l'ordre des pistes tel que demandé dans track_ids (index par track_id)
+        tracks_by_id = {track['track_id']: track for track in valid_tracks}
+        ordered_tracks = [tracks_by_id[tid] for tid in track_ids if tid in tracks_by_id]
         
         return {
             'statusCode': 200,
             'headers': cors_headers,
-            'body': json.dumps({'tracks': ordered_tracks, 'count': len(ordered_tracks)}, cls=DecimalEncoder)
+            'body': to_json({'tracks': ordered_tracks, 'count': len(ordered_tracks)})
         }
     
     except Exception as e:
@@ -497,32 +775,99 @@ def get_tracks_by_ids(track_ids, auth_user_id, cors_headers):
             'body': json.dumps({'message': f'Error retrieving tracks by IDs: {str(e)}'})
         }
 
-def get_user_tracks(user_id, auth_user_id, query_params, cors_headers):
-    """Récupère les pistes d'un utilisateur spécifique"""
+def encode_cursor(last_evaluated_key):
+    """Encode un LastEvaluatedKey en curseur opaque pour le client (None en fin de liste)"""
+    if not last_evaluated_key:
+        return None
+    return base64.urlsafe_b64encode(json.dumps(last_evaluated_key).encode()).decode()
+
+def decode_cursor(cursor):
+    """Décode un curseur client en clé au format AttributeValue ; None si le curseur est invalide"""
+    try:
+        start_key = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (ValueError, TypeError):
+        return None
+    if not isinstance(start_key, dict) or not all(isinstance(v, dict) and len(v) == 1 for v in start_key.values()):
+        return None
+    return start_key
+
+def get_user_tracks(user_id, auth_user_id, qs, cors_headers):
+    """
+    Récupère les pistes d'un utilisateur spécifique, triées par date de création (plus récentes
+    en premier). Avec ?limit=, les pages sont renvoyées dans l'ordre de l'index user_id-index,
+    le seul dans lequel le curseur reprend : leur concaténation conserve cet ordre
+    """
     try:
         # Paramètres de filtrage supplémentaires (genre, etc.)
-        genre = query_params.get('genre')
+        genre = qs.get('genre')
+        
+        # Pagination optionnelle : ?limit=N (et ?cursor= pour la suite) ; sans limit,
+        # toutes les pages sont lues
+        limit = None
+        start_key = None
+        if 'limit' in qs:
+            try:
+                limit = int(qs['limit'])
+            except (TypeError, ValueError):
+                limit = 0
+            if not 1 <= limit <= MAX_TRACKS_PAGE_SIZE:
+                return {
+                    'statusCode': 400,
+                    'headers': cors_headers,
+                    'body': json.dumps({'message': f'limit must be between 1 and {MAX_TRACKS_PAGE_SIZE}'})
+                }
+        if qs.get('cursor'):
+            start_key = decode_cursor(qs['cursor'])
+            if not start_key or start_key.get('user_id') != {'S': user_id}:
+                return {
+                    'statusCode': 400,
+                    'headers': cors_headers,
+                    'body': json.dumps({'message': 'Invalid cursor'})
+                }
         
         # Requête pour les pistes de l'utilisateur
-        query_params = {
+        query_kwargs = {
+            'TableName': TRACKS_TABLE,
             'IndexName': 'user_id-index',  # Assurez-vous que cet index existe sur la table des tracks
-            'KeyConditionExpression': Key('user_id').eq(user_id)
+            'KeyConditionExpression': '#user_id = :user_id',
+            'ProjectionExpression': TRACK_PROJECTION,
+            'ExpressionAttributeNames': {**TRACK_ATTRIBUTE_NAMES, '#user_id': 'user_id'},
+            'ExpressionAttributeValues': {':user_id': {'S': user_id}}
         }
+        filters = []
         
         # Ajouter un filtre par genre si spécifié
         if genre:
-            query_params['FilterExpression'] = Attr('genre').eq(genre)
+            filters.append('#genre = :genre')
+            query_kwargs['ExpressionAttributeNames']['#genre'] = 'genre'
+            query_kwargs['ExpressionAttributeValues'][':genre'] = {'S': genre}
         
         # Si l'utilisateur n'est pas le propriétaire, exclure les pistes privées
         if user_id != auth_user_id:
-            if 'FilterExpression' in query_params:
-                query_params['FilterExpression'] = query_params['FilterExpression'] & Attr('isPrivate').ne(True)
-            else:
-                query_params['FilterExpression'] = Attr('isPrivate').ne(True)
+            filters.append('#isPrivate <> :private')
+            query_kwargs['ExpressionAttributeNames']['#isPrivate'] = 'isPrivate'
+            query_kwargs['ExpressionAttributeValues'][':private'] = {'BOOL': True}
         
-        # Exécuter la requête
-        response = tracks_table.query(**query_params)
-        tracks = response.get('Items', [])
+        if filters:
+            query_kwargs['FilterExpression'] = ' AND '.join(filters)
+        
+        if start_key:
+            query_kwargs['ExclusiveStartKey'] = start_key
+        
+        # Exécuter la requête en suivant LastEvaluatedKey : les filtres s'appliquent après la
+        # lecture de chaque page de 1 Mo, une page peut donc être vide sans que la liste soit finie.
+        # Avec limit, chaque page n'évalue que les éléments manquants pour que le curseur
+        # reprenne exactement après la dernière piste renvoyée
+        tracks = []
+        while True:
+            if limit:
+                query_kwargs['Limit'] = limit - len(tracks)
+            response = dynamodb_client.query(**query_kwargs)
+            tracks.extend(deserialize_item(item) for item in response.get('Items', []))
+            last_key = response.get('LastEvaluatedKey')
+            if not last_key or (limit and len(tracks) >= limit):
+                break
+            query_kwargs['ExclusiveStartKey'] = last_key
         
         # Générer les URLs présignées et vérifier si l'utilisateur a liké les pistes
         tracks_with_urls = generate_presigned_urls(tracks, auth_user_id)
@@ -530,13 +875,19 @@ def get_user_tracks(user_id, auth_user_id, query_params, cors_headers):
         # Filtrer les pistes avec des fichiers manquants
         valid_tracks = [track for track in tracks_with_urls if not track.get('file_missing')]
         
-        # Tri par date de création (plus récent en premier)
-        valid_tracks.sort(key=lambda x: x.get('created_at', 0), reverse=True)
+        # Tri par date de création (plus récent en premier) de la liste complète ; une page
+        # n'est pas retriée, ce qui casserait l'ordre d'une page à l'autre
+        if not limit:
+            valid_tracks.sort(key=lambda x: x.get('created_at', 0), reverse=True)
         
         return {
             'statusCode': 200,
             'headers': cors_headers,
-            'body': json.dumps({'tracks': valid_tracks, 'count': len(valid_tracks)}, cls=DecimalEncoder)
+            'body': to_json({
+                'tracks': valid_tracks,
+                'count': len(valid_tracks),
+                'cursor': encode_cursor(last_key) if limit else None
+            })
         }
     
     except Exception as e:
@@ -18,12 +18,26 @@ dynamodb = boto3.resource('dynamodb')
 LIKES_TABLE = os.environ.get('LIKES_TABLE', 'chordora-track-likes')
 FAVORITES_TABLE = os.environ.get('FAVORITES_TABLE', 'chordora-track-favorites')  # Nouvelle table pour les favoris
 TRACKS_TABLE = os.environ.get('TRACKS_TABLE', 'chordora-tracks')
+REDIS_HOST = os.environ.get('REDIS_HOST')
 
 # Tables DynamoDB
 likes_table = dynamodb.Table(LIKES_TABLE)
 favorites_table = dynamodb.Table(FAVORITES_TABLE)  # Nouvelle référence à la table de favoris
 tracks_table = dynamodb.Table(TRACKS_TABLE)
 
+# Cache Redis (ElastiCache) de l'état « liké » des pistes alimenté par GetTracks ;
+# invalidé ici à chaque like / unlike lorsque REDIS_HOST est défini
+if REDIS_HOST:
+    import redis
+    redis_client = redis.Redis(
+        host=REDIS_HOST,
+        port=int(os.environ.get('REDIS_PORT', '6379')),
+        socket_timeout=0.05,
+        socket_connect_timeout=0.05
+    )
+else:
+    redis_client = None
+
 # Classe pour l'encodage des décimaux en JSON
 class DecimalEncoder(json.JSONEncoder):
     def default(self, obj):
@@ -31,6 +45,15 @@ class DecimalEncoder(json.JSONEncoder):
             return float(obj)
         return super(DecimalEncoder, self).default(obj)
 
+def invalidate_likes_cache(user_id):
+    """Supprime de Redis l'état « liké » des pistes mis en cache pour l'utilisateur"""
+    if redis_client is None:
+        return
+    try:
+        redis_client.delete(f"lk:{user_id}")
+    except redis.RedisError as e:
+        logger.error(f"Impossible d'invalider le cache des likes de {user_id}: {str(e)}")
+
 def get_cors_headers():
     """
     Renvoie les en-têtes CORS standard
@@ -43,7 +66,8 @@ def get_cors_headers():
     }
 
 def lambda_handler(event, context):
-    logger.info(f"Événement reçu: {json.dumps(event)}")
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Événement reçu: %s", json.dumps(event))
     cors_headers = get_cors_headers()
     
     # Gestion des requêtes OPTIONS (pre-flight CORS)
@@ -303,6 +327,7 @@ def add_like(event, user_id, cors_headers):
                 'created_at': timestamp
             }
         )
+        invalidate_likes_cache(user_id)
         
         # Incrémenter le compteur de likes de la piste
         try:
@@ -435,6 +460,7 @@ def remove_like(event, user_id, cors_headers):
         
         # Supprimer le like
         likes_table.delete_item(Key={'like_id': like_id})
+        invalidate_likes_cache(user_id)
         
         # Décrémenter le compteur de likes de la piste
         try:
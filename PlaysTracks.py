@@ -37,7 +37,8 @@ def get_cors_headers():
     }
 
 def lambda_handler(event, context):
-    logger.info(f"Événement reçu: {json.dumps(event)}")
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Événement reçu: %s", json.dumps(event))
     cors_headers = get_cors_headers()
     
     # Gestion des requêtes OPTIONS (pre-flight CORS)
@@ -14,12 +14,32 @@ logger.setLevel(logging.INFO)
 # Variables d'environnement
 PLAYLISTS_TABLE = os.environ.get('PLAYLISTS_TABLE', 'chordora-playlists')
 TRACKS_TABLE = os.environ.get('TRACKS_TABLE', 'chordora-tracks')
+REDIS_HOST = os.environ.get('REDIS_HOST')
 
 # Initialisation des clients AWS
 dynamodb = boto3.resource('dynamodb')
 playlists_table = dynamodb.Table(PLAYLISTS_TABLE)
 tracks_table = dynamodb.Table(TRACKS_TABLE)
 
+# Attributs des pistes recopiés dans l'instantané tracks_snapshot des playlists : ceux lus par
+# GetPlaylists (PLAYLIST_TRACK_ATTRIBUTES) hors compteurs likes / plays, relus à chaque lecture
+TRACK_SNAPSHOT_FIELDS = [
+    'track_id', 'user_id', 'title', 'genre', 'bpm', 'duration', 'mood', 'tags',
+    'file_path', 'cover_image_path', 'isPrivate', 'created_at'
+]
+
+# Cache Redis des réponses de GetPlaylists, invalidé à chaque écriture
+if REDIS_HOST:
+    import redis
+    redis_client = redis.Redis(
+        host=REDIS_HOST,
+        port=int(os.environ.get('REDIS_PORT', '6379')),
+        socket_timeout=0.05,
+        socket_connect_timeout=0.05
+    )
+else:
+    redis_client = None
+
 class DecimalEncoder(json.JSONEncoder):
     def default(self, obj):
         if isinstance(obj, Decimal):
@@ -41,9 +61,36 @@ def get_cors_headers(event):
         'Access-Control-Allow-Credentials': 'true'
     }
 
+def build_tracks_snapshot(track_ids, track_items):
+    """
+    Construit l'instantané des pistes stocké sur la playlist, lu par GetPlaylists à la place
+    d'un BatchGetItem complet sur la table des pistes. UpdateTracks le retire lorsqu'une de ses
+    pistes est modifiée ou supprimée ; les compteurs (likes, plays), qui évoluent en continu,
+    n'y figurent pas et sont relus par GetPlaylists
+    """
+    return [
+        {field: track_items[track_id][field] for field in TRACK_SNAPSHOT_FIELDS if field in track_items[track_id]}
+        for track_id in dict.fromkeys(track_ids)
+    ]
+
+def invalidate_playlist_cache(playlist_id, user_id):
+    """Supprime de Redis la playlist et les listes de playlists de son propriétaire"""
+    if redis_client is None:
+        return
+    keys = [f"pl:{playlist_id}"] + [
+        f"upl:{user_id}:{scope}:{detail}"
+        for scope in ('owner', 'public')
+        for detail in ('tracks', 'summary')
+    ]
+    try:
+        redis_client.delete(*keys)
+    except redis.RedisError as e:
+        logger.error(f"Impossible d'invalider le cache de la playlist {playlist_id}: {str(e)}")
+
 def lambda_handler(event, context):
     """Gestionnaire principal de la Lambda"""
-    logger.info(f"Événement reçu: {json.dumps(event)}")
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Événement reçu: %s", json.dumps(event))
     cors_headers = get_cors_headers(event)
     
     # Gestion des requêtes OPTIONS (pre-flight CORS)
@@ -155,6 +202,7 @@ def handle_create_update_playlist(event, user_id, cors_headers):
             # Mise à jour des données
             track_ids = []
             track_positions = {}
+            track_items = {}
             
             if 'tracks' in body and isinstance(body['tracks'], list):
                 # Vérifier et ajouter chaque piste
@@ -171,6 +219,7 @@ def handle_create_update_playlist(event, user_id, cors_headers):
                                 if track_owner == user_id:
                                     track_ids.append(track_id)
                                     track_positions[track_id] = i
+                                    track_items[track_id] = track_response['Item']
                                 else:
                                     logger.warning(f"L'utilisateur {user_id} a tenté d'ajouter une piste {track_id} qui ne lui appartient pas")
                                     # Continuer sans ajouter cette piste
@@ -195,6 +244,7 @@ def handle_create_update_playlist(event, user_id, cors_headers):
             if track_ids:
                 playlist_update['track_ids'] = track_ids
                 playlist_update['track_positions'] = track_positions
+                playlist_update['tracks_snapshot'] = build_tracks_snapshot(track_ids, track_items)
             
             # Construire l'expression de mise à jour
             update_expression = "SET "
@@ -213,6 +263,7 @@ def handle_create_update_playlist(event, user_id, cors_headers):
                 UpdateExpression=update_expression,
                 ExpressionAttributeValues=expression_values
             )
+            invalidate_playlist_cache(playlist_id, user_id)
             
             # Récupérer la playlist mise à jour
             updated_response = playlists_table.get_item(Key={'playlist_id': playlist_id})
@@ -234,6 +285,7 @@ def handle_create_update_playlist(event, user_id, cors_headers):
             # Préparer les données des pistes
             track_ids = []
             track_positions = {}
+            track_items = {}
             
             if 'tracks' in body and isinstance(body['tracks'], list):
                 # Vérifier et ajouter chaque piste
@@ -250,6 +302,7 @@ def handle_create_update_playlist(event, user_id, cors_headers):
                                 if track_owner == user_id:
                                     track_ids.append(track_id)
                                     track_positions[track_id] = i
+                                    track_items[track_id] = track_response['Item']
                                 else:
                                     logger.warning(f"L'utilisateur {user_id} a tenté d'ajouter une piste {track_id} qui ne lui appartient pas")
                                     # Continuer sans ajouter cette piste
@@ -269,11 +322,13 @@ def handle_create_update_playlist(event, user_id, cors_headers):
                 'updated_at': timestamp,
                 'track_count': len(track_ids),
                 'track_ids': track_ids,
-                'track_positions': track_positions
+                'track_positions': track_positions,
+                'tracks_snapshot': build_tracks_snapshot(track_ids, track_items)
             }
             
             # Enregistrement dans DynamoDB
             playlists_table.put_item(Item=playlist)
+            invalidate_playlist_cache(playlist_id, user_id)
             
             return {
                 'statusCode': 201,
@@ -330,6 +385,7 @@ def handle_delete_playlist(event, user_id, cors_headers):
         
         # Supprimer la playlist
         playlists_table.delete_item(Key={'playlist_id': playlist_id})
+        invalidate_playlist_cache(playlist_id, user_id)
         
         return {
             'statusCode': 200,
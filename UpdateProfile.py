@@ -17,12 +17,33 @@ TABLE_NAME = os.environ.get('USERS_TABLE', 'chordora-users')
 BUCKET_NAME = os.environ.get('BUCKET_NAME', 'chordora-users')
 DEFAULT_PROFILE_IMAGE_KEY = os.environ.get('DEFAULT_PROFILE_IMAGE_KEY', 'public/default-profile.jpg')
 AWS_REGION = os.environ.get('AWS_REGION', 'us-east-1')
+REDIS_HOST = os.environ.get('REDIS_HOST')
+
+# Attributs du profil modifiables par l'utilisateur : ceux absents de la requête sont supprimés,
+# les autres attributs de l'élément (compteurs d'abonnements, createdAt...) sont conservés
+PROFILE_FIELDS = [
+    'email', 'username', 'bio', 'userType', 'experienceLevel', 'location', 'software',
+    'musicalMood', 'availabilityStatus', 'musicGenres', 'tags', 'equipment', 'favoriteArtists',
+    'socialLinks', 'profileImageUrl'
+]
 
 # Initialisation des clients AWS
 dynamodb = boto3.resource('dynamodb')
 table = dynamodb.Table(TABLE_NAME)
 s3 = boto3.client('s3')
 
+# Cache Redis des profils résumés (alimenté par FollowProfile), invalidé à chaque mise à jour
+if REDIS_HOST:
+    import redis
+    redis_client = redis.Redis(
+        host=REDIS_HOST,
+        port=int(os.environ.get('REDIS_PORT', '6379')),
+        socket_timeout=0.05,
+        socket_connect_timeout=0.05
+    )
+else:
+    redis_client = None
+
 class DecimalEncoder(json.JSONEncoder):
     def default(self, obj):
         if isinstance(obj, Decimal):
@@ -62,7 +83,8 @@ def get_cors_headers(event):
     }
 
 def lambda_handler(event, context):
-    logger.info(f"Événement reçu: {json.dumps(event)}")
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Événement reçu: %s", json.dumps(event))
     cors_headers = get_cors_headers(event)
     
     if event['httpMethod'] == 'OPTIONS':
@@ -149,13 +171,15 @@ def handle_update_profile(event, cors_headers, user_id):
         body = json.loads(event['body'])
         profile_data = body['profileData']
         
-        logger.info(f"Données de profil reçues: {json.dumps({k: '...' if k == 'profileImageBase64' else v for k, v in profile_data.items()})}")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Données de profil reçues: %s", json.dumps({k: '...' if k == 'profileImageBase64' else v for k, v in profile_data.items()}))
         logger.info(f"Profil contient une image? {'profileImageBase64' in profile_data}")
 
         profile_data['userId'] = user_id
         
         sanitized_profile_data = sanitize_profile_data(profile_data)
-        logger.info(f"Données de profil assainies: {json.dumps({k: '...' if k == 'profileImageBase64' else v for k, v in sanitized_profile_data.items()})}")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Données de profil assainies: %s", json.dumps({k: '...' if k == 'profileImageBase64' else v for k, v in sanitized_profile_data.items()}))
 
         existing_user = table.get_item(Key={'userId': user_id}).get('Item')
         
@@ -173,7 +197,7 @@ def handle_update_profile(event, cors_headers, user_id):
             logger.info(f"URL d'image existante: {existing_user.get('profileImageUrl')}")
             
             sanitized_profile_data['profileCompleted'] = existing_user.get('profileCompleted', True)
-            
+
             if sanitized_profile_data['profileCompleted']:
                 logger.info(f"Le profil de {user_id} est déjà marqué comme complété")
             else:
@@ -245,7 +269,29 @@ def handle_update_profile(event, cors_headers, user_id):
         logger.info(f"URL finale de l'image avant sauvegarde: {sanitized_profile_data.get('profileImageUrl')}")
 
         logger.info(f"Mise à jour du profil dans DynamoDB pour l'utilisateur {user_id}")
-        table.put_item(Item=sanitized_profile_data)
+        # update_item plutôt qu'un put_item complet : les compteurs d'abonnements, incrémentés
+        # en parallèle par FollowProfile, ne sont jamais réécrits ici
+        attributes = {k: v for k, v in sanitized_profile_data.items() if k != 'userId'}
+        names = {f'#f{i}': name for i, name in enumerate(attributes)}
+        values = {f':v{i}': value for i, value in enumerate(attributes.values())}
+        update_expression = 'SET ' + ', '.join(f'#f{i} = :v{i}' for i in range(len(attributes)))
+        removed_fields = [field for field in PROFILE_FIELDS if field not in attributes]
+        if removed_fields:
+            offset = len(attributes)
+            names.update({f'#f{offset + i}': name for i, name in enumerate(removed_fields)})
+            update_expression += ' REMOVE ' + ', '.join(f'#f{offset + i}' for i in range(len(removed_fields)))
+        table.update_item(
+            Key={'userId': user_id},
+            UpdateExpression=update_expression,
+            ExpressionAttributeNames=names,
+            ExpressionAttributeValues=values
+        )
+
+        if redis_client is not None:
+            try:
+                redis_client.delete(f"u:{user_id}")
+            except redis.RedisError as e:
+                logger.error(f"Impossible d'invalider le profil en cache: {str(e)}")
 
         try:
             updated_item = table.get_item(Key={'userId': user_id})
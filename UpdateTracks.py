@@ -5,7 +5,9 @@ import uuid
 import datetime
 import base64
 import logging
-from boto3.dynamodb.conditions import Key, Attr
+from boto3.dynamodb.conditions import Key
+from boto3.dynamodb.types import TypeDeserializer, TypeSerializer
+from botocore.config import Config
 from decimal import Decimal
 import traceback
 
@@ -45,27 +47,66 @@ def get_mime_type(image_content):
     else:
         return 'image/jpeg'  # Par défaut
 
+# Configuration botocore partagée : pool de connexions borné et keep-alive TCP
+# pour réutiliser les connexions TLS entre invocations d'un même conteneur
+BOTO_CONFIG = Config(
+    max_pool_connections=50,
+    retries={'max_attempts': 3, 'mode': 'adaptive'},
+    tcp_keepalive=True
+)
+
 # Initialisation des clients AWS
-s3 = boto3.client('s3')
-dynamodb = boto3.resource('dynamodb')
+s3 = boto3.client('s3', config=BOTO_CONFIG)
+dynamodb = boto3.resource('dynamodb', config=BOTO_CONFIG)
+serializer = TypeSerializer()
+deserializer = TypeDeserializer()
 
 # Variables d'environnement
 BUCKET_NAME = os.environ.get('BUCKET_NAME', 'chordora-users')
 TRACKS_TABLE = os.environ.get('TRACKS_TABLE', 'chordora-tracks')
+PLAYLISTS_TABLE = os.environ.get('PLAYLISTS_TABLE', 'chordora-playlists')
+REDIS_HOST = os.environ.get('REDIS_HOST')
+
+# Cache Redis des réponses de GetPlaylists, invalidé lorsqu'une piste d'une playlist
+# est modifiée ou supprimée
+if REDIS_HOST:
+    import redis
+    redis_client = redis.Redis(
+        host=REDIS_HOST,
+        port=int(os.environ.get('REDIS_PORT', '6379')),
+        socket_timeout=0.05,
+        socket_connect_timeout=0.05
+    )
+else:
+    redis_client = None
+
+# Attributs des pistes renvoyés par les lectures (GET) ; les noms passent par des alias
+# pour ne pas entrer en conflit avec les mots réservés de DynamoDB
+TRACK_ATTRIBUTES = [
+    'track_id', 'user_id', 'title', 'genre', 'bpm', 'duration', 'mood', 'tags', 'description',
+    'file_path', 'cover_image_path', 'isPrivate', 'likes', 'plays', 'created_at', 'updated_at'
+]
+TRACK_PROJECTION = ', '.join(f'#a{i}' for i in range(len(TRACK_ATTRIBUTES)))
+TRACK_ATTRIBUTE_NAMES = {f'#a{i}': name for i, name in enumerate(TRACK_ATTRIBUTES)}
+
+# Taille maximale d'une page de pistes (paramètre limit)
+MAX_TRACKS_PAGE_SIZE = 100
 
 def lambda_handler(event, context):
-    logger.info(f"Received event: {json.dumps(event)}")
-    
     http_method = event['httpMethod']
     cors_headers = get_cors_headers()
     
+    # Requête OPTIONS pour CORS (pre-flight) : réponse immédiate, sans corps ni journalisation
     if http_method == 'OPTIONS':
         return {
-            'statusCode': 200,
+            'statusCode': 204,
             'headers': cors_headers,
-            'body': json.dumps('OK')
+            'body': ''
         }
     
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Received event: %s", json.dumps(event))
+    
     try:
         # Vérification de l'authentification
         if 'requestContext' not in event or 'authorizer' not in event['requestContext'] or 'claims' not in event['requestContext']['authorizer']:
@@ -115,15 +156,128 @@ def lambda_handler(event, context):
             'body': json.dumps({'message': f'Internal server error: {str(e)}'})
         }
 
+def invalidate_playlists_with_track(track_id, owner_id):
+    """
+    Retire l'instantané tracks_snapshot des playlists contenant la piste, qui repassent par
+    la lecture de la table des pistes jusqu'à leur prochain enregistrement, et supprime leurs
+    réponses en cache Redis. Une playlist ne pouvant contenir que des pistes de son
+    propriétaire, seules les playlists de owner_id sont parcourues
+    """
+    playlists_table = dynamodb.Table(PLAYLISTS_TABLE)
+    query_kwargs = {
+        'IndexName': 'user_id-index',
+        'KeyConditionExpression': Key('user_id').eq(owner_id),
+        'FilterExpression': 'contains(track_ids, :track_id)',
+        'ExpressionAttributeValues': {':track_id': track_id},
+        'ProjectionExpression': 'playlist_id'
+    }
+    playlist_ids = []
+    while True:
+        response = playlists_table.query(**query_kwargs)
+        playlist_ids.extend(item['playlist_id'] for item in response.get('Items', []))
+        if 'LastEvaluatedKey' not in response:
+            break
+        query_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+    
+    for playlist_id in playlist_ids:
+        playlists_table.update_item(
+            Key={'playlist_id': playlist_id},
+            UpdateExpression='REMOVE tracks_snapshot'
+        )
+    logger.info(f"Instantané retiré de {len(playlist_ids)} playlist(s) contenant la piste {track_id}")
+    
+    if redis_client is None or not playlist_ids:
+        return
+    keys = [f"pl:{playlist_id}" for playlist_id in playlist_ids] + [
+        f"upl:{owner_id}:{scope}:{detail}"
+        for scope in ('owner', 'public')
+        for detail in ('tracks', 'summary')
+    ]
+    try:
+        redis_client.delete(*keys)
+    except redis.RedisError as e:
+        logger.error(f"Impossible d'invalider le cache des playlists de la piste {track_id}: {str(e)}")
+
+def encode_cursor(last_evaluated_key):
+    """
+    Encode un LastEvaluatedKey en curseur opaque pour le client (None en fin de liste).
+    La clé est sérialisée au format AttributeValue (nombres en chaînes), comme dans GetTracks
+    """
+    if not last_evaluated_key:
+        return None
+    attribute_values = {name: serializer.serialize(value) for name, value in last_evaluated_key.items()}
+    return base64.urlsafe_b64encode(json.dumps(attribute_values).encode()).decode()
+
+def decode_cursor(cursor):
+    """Décode un curseur client en clé au format AttributeValue ; None si le curseur est invalide"""
+    try:
+        start_key = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (ValueError, TypeError):
+        return None
+    if not isinstance(start_key, dict) or not all(isinstance(v, dict) and len(v) == 1 for v in start_key.values()):
+        return None
+    return start_key
+
 def handle_get_all_tracks(event, user_id, cors_headers):
     logger.info(f"Handling GET request for all tracks, user_id: {user_id}")
     try:
         table = dynamodb.Table(TRACKS_TABLE)
-        response = table.scan(
-            FilterExpression=Attr('user_id').eq(user_id)
-        )
+        query_string = event.get('queryStringParameters') or {}
+        
+        # Query sur l'index user_id-index (déjà utilisé par GetTracks) au lieu d'un Scan filtré
+        # de toute la table
+        query_kwargs = {
+            'IndexName': 'user_id-index',
+            'KeyConditionExpression': Key('user_id').eq(user_id),
+            'ProjectionExpression': TRACK_PROJECTION,
+            'ExpressionAttributeNames': TRACK_ATTRIBUTE_NAMES
+        }
         
-        tracks = response.get('Items', [])
+        # Pagination optionnelle : avec ?limit=N (et ?cursor= pour la suite), une seule page est
+        # lue et la réponse devient {tracks, cursor} ; sans limit, toutes les pages sont lues.
+        # Les pistes sont renvoyées dans l'ordre de l'index user_id-index (comme GetTracks en mode
+        # paginé), le seul dans lequel le curseur reprend : les pages concaténées le conservent
+        paginated = 'limit' in query_string
+        if paginated:
+            try:
+                limit = int(query_string['limit'])
+            except (TypeError, ValueError):
+                limit = 0
+            if not 1 <= limit <= MAX_TRACKS_PAGE_SIZE:
+                return {
+                    'statusCode': 400,
+                    'headers': cors_headers,
+                    'body': json.dumps({'message': f'limit must be between 1 and {MAX_TRACKS_PAGE_SIZE}'})
+                }
+            query_kwargs['Limit'] = limit
+            
+            if query_string.get('cursor'):
+                start_key = decode_cursor(query_string['cursor'])
+                if not start_key or start_key.get('user_id') != {'S': user_id}:
+                    return {
+                        'statusCode': 400,
+                        'headers': cors_headers,
+                        'body': json.dumps({'message': 'Invalid cursor'})
+                    }
+                try:
+                    query_kwargs['ExclusiveStartKey'] = {
+                        name: deserializer.deserialize(value) for name, value in start_key.items()
+                    }
+                except (TypeError, ValueError, KeyError, ArithmeticError):
+                    return {
+                        'statusCode': 400,
+                        'headers': cors_headers,
+                        'body': json.dumps({'message': 'Invalid cursor'})
+                    }
+        
+        tracks = []
+        while True:
+            response = table.query(**query_kwargs)
+            tracks.extend(response.get('Items', []))
+            # Suivre LastEvaluatedKey pour ne pas tronquer à 1 Mo (mode sans pagination)
+            if paginated or 'LastEvaluatedKey' not in response:
+                break
+            query_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
         logger.info(f"Found {len(tracks)} tracks for user {user_id}")
         
         # Générer des URLs présignées pour les pistes et leurs covers
@@ -151,10 +305,15 @@ def handle_get_all_tracks(event, user_id, cors_headers):
                 except Exception as e:
                     logger.error(f"Error generating presigned URL for cover image {track.get('track_id')}: {str(e)}")
         
+        if paginated:
+            body = {'tracks': tracks, 'cursor': encode_cursor(response.get('LastEvaluatedKey'))}
+        else:
+            body = tracks
+        
         return {
             'statusCode': 200,
             'headers': cors_headers,
-            'body': json.dumps(tracks, cls=DecimalEncoder)
+            'body': json.dumps(body, cls=DecimalEncoder)
         }
     except Exception as e:
         logger.error(f"Error in handle_get_all_tracks: {str(e)}")
@@ -171,7 +330,11 @@ def handle_get_track(event, user_id, cors_headers):
         track_id = event['pathParameters']['trackId']
         
         table = dynamodb.Table(TRACKS_TABLE)
-        response = table.get_item(Key={'track_id': track_id})
+        response = table.get_item(
+            Key={'track_id': track_id},
+            ProjectionExpression=TRACK_PROJECTION,
+            ExpressionAttributeNames=TRACK_ATTRIBUTE_NAMES
+        )
         
         if 'Item' not in response:
             return {
@@ -601,6 +764,12 @@ def handle_put(event, user_id, cors_headers):
             )
             
             logger.info(f"Track {track_id} updated successfully")
+            
+            # Les playlists contenant la piste ne doivent plus servir ses anciennes métadonnées
+            try:
+                invalidate_playlists_with_track(track_id, user_id)
+            except Exception as e:
+                logger.error(f"Error invalidating playlists for track {track_id}: {str(e)}")
             return {
                 'statusCode': 200,
                 'headers': cors_headers,
@@ -690,6 +859,12 @@ def handle_delete(event, user_id, cors_headers):
         )
         logger.info(f"Track deleted from DynamoDB: {track_id}")
         
+        # Les playlists contenant la piste ne doivent plus la servir depuis leur instantané
+        try:
+            invalidate_playlists_with_track(track_id, user_id)
+        except Exception as e:
+            logger.error(f"Error invalidating playlists for track {track_id}: {str(e)}")
+        
         return {
             'statusCode': 200,
             'headers': cors_headers,
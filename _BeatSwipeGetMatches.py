@@ -128,7 +128,8 @@ def generate_presigned_url_for_profile_image(bucket, key):
 
 def lambda_handler(event, context):
     """Récupère les matches BeatSwipe pour un utilisateur"""
-    logger.info(f"Événement reçu: {json.dumps(event)}")
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Événement reçu: %s", json.dumps(event))
     cors_headers = get_cors_headers(event)
     
     # Requête OPTIONS pour CORS
@@ -51,7 +51,8 @@ def get_cors_headers(event):
     }
 
 def lambda_handler(event, context):
-    logger.info(f"Événement reçu: {json.dumps(event)}")
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Événement reçu: %s", json.dumps(event))
     cors_headers = get_cors_headers(event)
     
     # Requête OPTIONS pour CORS